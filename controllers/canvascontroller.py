@@ -1,3 +1,4 @@
+import time
 import numpy as np
 from copy import copy
 
@@ -8,7 +9,9 @@ from models.pixelgroup import *
 from models.canvas import Canvas
 
 from lib.dtypes import rgb888_color
-from lib.geometry import hit_test_rect, inflate_rect, vec2_sum
+from lib.geometry import inflate_rect, vec2_sum
+from lib.instrumentation import metrics
+from lib.profiler import profile_stage, profiler
 
 
 class CanvasController(QObject):
@@ -33,11 +36,58 @@ class CanvasController(QObject):
         self.adding_type = None
         self.ghost_item = None
 
+        # Set when the NetController runs on its own thread
+        self.frame_buffer = None
+
+        # (received_at, handed_off_at) of the newest frame not yet painted
+        self._unpainted_frame = None
+
+    @profile_stage("handoff")
+    def swap_frame(self):
+        """
+        Takes the newest frame from the threaded NetController, if any.
+        Called by the view at the start of each paint.
+        """
+        if self.frame_buffer is None:
+            return
+        frame = self.frame_buffer.swap()
+        if frame is not None:
+            self.on_new_frame(frame)
+
     @pyqtSlot(dict)
+    @profile_stage("handoff")
     def on_new_frame(self, frame):
         for strand, data in frame.items():
+            # data is a uint8 view onto the received datagram; reshaping it
+            # does not copy.
             self.model.color_data[strand] =\
-                np.asarray(data).reshape((-1, 3))
+                np.asarray(data, dtype=np.uint8).reshape((-1, 3))
+        self.model.dirty = True
+
+        # Frames from the network carry timestamps (see NetController.Frame);
+        # frames from a capture file are plain dicts.
+        handed_off_at = time.perf_counter()
+        completed_at = getattr(frame, "completed_at", None)
+        if completed_at is not None:
+            metrics.record("complete_to_handoff", handed_off_at - completed_at)
+        self._unpainted_frame = (getattr(frame, "received_at", None),
+                                 handed_off_at)
+
+    def frame_painted(self, paint_started_at):
+        """
+        Called by the view at the end of each paint.  Records the paint
+        duration and, for the first paint after a new frame arrived, how
+        long that frame took to reach the screen.
+        """
+        painted_at = time.perf_counter()
+        metrics.record("paint", painted_at - paint_started_at)
+        if self._unpainted_frame is None:
+            return
+        received_at, handed_off_at = self._unpainted_frame
+        self._unpainted_frame = None
+        metrics.record("handoff_to_paint", painted_at - handed_off_at)
+        if received_at is not None:
+            metrics.record("glass_to_glass", painted_at - received_at)
 
 
 # Adding pixel groups should actually be a toggle-able mode, not a single click.
@@ -56,8 +106,8 @@ class CanvasController(QObject):
 
     def try_select_under_cursor(self, pos):
         """
-        Right now this is done in a naive way.  There are more advanced
-        algorithms that could be put in place if performance is an issue.
+        Selects the closest object under the cursor.  Candidates come from the
+        scene's spatial index (see get_objects_under_cursor).
         """
         mods = QGuiApplication.keyboardModifiers()
         add_selection = (mods == Qt.ControlModifier)
@@ -76,6 +126,7 @@ class CanvasController(QObject):
                     self.select(pg, False)
         self.select(self.selection_candidates[0], not remove_selection)
 
+    @profile_stage("hit_test")
     def get_objects_under_cursor(self, pos):
         """
         Returns a list of all objects somewhat close to the cursor
@@ -83,8 +134,7 @@ class CanvasController(QObject):
         """
         pos = self.view.canvas_to_scene((pos.x(), pos.y()))
 
-        candidates = [pg for pg in self.model.scene.pixel_groups
-                      if hit_test_rect(pg.bounding_box(), pos)]
+        candidates = self.model.scene.get_pixel_groups_at(pos)
 
         if len(candidates) == 0:
             return []
@@ -217,6 +267,10 @@ class CanvasController(QObject):
                     (self.selection_index + 1) % len(self.selection_candidates)
                 self.select(self.selection_candidates[self.selection_index], True)
 
+        # F9: start/stop the sampling profiler
+        elif event.key() == Qt.Key_F9:
+            profiler.toggle()
+
         elif event.key() == Qt.Key_Escape:
             if self.model.design_mode:
                 if self.dragging:
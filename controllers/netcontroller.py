@@ -1,30 +1,76 @@
 from __future__ import division
 from past.utils import old_div
+import socket
 import time
 import logging as log
+import numpy as np
 import zmq
 
 from PyQt5 import QtCore, QtNetwork
 
+from lib.instrumentation import metrics
+from lib.profiler import profile_stage
+
 USE_ZMQ = False
 
+# Receive backends: "qt" reads through QUdpSocket one datagram at a time,
+# "socket" drains a plain non-blocking socket in batches.
+BACKENDS = ("qt", "socket")
+
+MAX_DATAGRAM_SIZE = 65536
+RECEIVE_BATCH_SIZE = 256
+
+
+class Frame(dict):
+    """
+    A completed frame: strand -> uint8 RGB data, stamped with the
+    time.perf_counter() times at which its first packet was parsed
+    (received_at) and at which its 'E' packet arrived (completed_at).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(Frame, self).__init__(*args, **kwargs)
+        self.received_at = None
+        self.completed_at = None
+
 
 class NetController(QtCore.QObject):
 
     data_received = QtCore.pyqtSignal(list)
     start = QtCore.pyqtSignal()
     new_frame = QtCore.pyqtSignal(dict)
-
-    def __init__(self, app):
+    # Emitted when a frame published to frame_buffer should wake the consumer
+    frame_ready = QtCore.pyqtSignal()
+
+    def __init__(self, app, frame_buffer=None, backend="qt", port=3020):
+        """
+        If `frame_buffer` (a TripleBuffer) is given, completed frames are
+        also published to it.  This is used when the controller is moved to
+        its own thread, so that the GUI picks up frames when it paints rather
+        than queueing one signal per frame; new_frame should then only have
+        direct connections (such as the recorder).  frame_ready is emitted at
+        most once per swap, to wake the GUI when a frame is waiting.
+
+        `backend` selects how datagrams are read (see BACKENDS).
+        """
         super(NetController, self).__init__()
+        if backend not in BACKENDS:
+            raise ValueError("Unknown network backend %s" % backend)
+
         self.context = None
         self.socket = None
+        self.notifier = None
         self.app = app
+        self.frame_buffer = frame_buffer
 
         self.in_frame = False
         self.running = True
 
-        self._frame_data = {}
+        self._frame_data = Frame()
+        self._frame_received_at = None
+        self.dropped_frames = 0
+        self.frames_completed = 0
+        self.malformed_packets = 0
 
         self._frame_count = 0
         self._frame_time = time.perf_counter()
@@ -33,6 +79,7 @@ class NetController(QtCore.QObject):
         self._packet_count = 0
         self._packet_time = time.perf_counter()
         self.pps = 0
+        self.packets_received = 0
 
         if USE_ZMQ:
             self.context = zmq.Context()
@@ -40,30 +87,77 @@ class NetController(QtCore.QObject):
             self.socket.connect("tcp://localhost:3020")
             self.socket.setsockopt_string(zmq.SUBSCRIBE, u"")
             self.start.connect(self.run)
+        elif backend == "socket":
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.socket.bind(("", port))
+            self.socket.setblocking(False)
+            self.notifier = QtCore.QSocketNotifier(self.socket.fileno(),
+                                                   QtCore.QSocketNotifier.Read,
+                                                   self)
+            self.notifier.activated.connect(self.read_datagram_batch)
         else:
             self.socket = QtNetwork.QUdpSocket(self)
             self.socket.readyRead.connect(self.read_datagrams)
-            self.socket.bind(3020, QtNetwork.QUdpSocket.ShareAddress | QtNetwork.QUdpSocket.ReuseAddressHint)
+            self.socket.bind(port, QtNetwork.QUdpSocket.ShareAddress | QtNetwork.QUdpSocket.ReuseAddressHint)
+
+    def close(self):
+        self.running = False
+        if self.notifier is not None:
+            self.notifier.setEnabled(False)
+        if self.socket is not None:
+            self.socket.close()
 
     @QtCore.pyqtSlot()
+    @profile_stage("net")
     def read_datagrams(self):
         while self.socket.hasPendingDatagrams():
-            datagram = QtCore.QByteArray()
-            datagram.resize(self.socket.pendingDatagramSize())
-            (datagram, sender, sport) = self.socket.readDatagram(datagram.size())
-            # TODO(JE): is this the best way for Py2/Py3 compatability?
+            size = self.socket.pendingDatagramSize()
+            (datagram, sender, sport) = self.socket.readDatagram(size)
+            # PyQt5 hands back an immutable bytes object, which process_packet
+            # can index directly and wrap with np.frombuffer without copying.
             if type(datagram) is bytes:
-                packet = [c for c in datagram]
+                packet = datagram
             else:
-                packet = [ord(c) for c in datagram.data()]
-            self._packet_count += 1
-            delta = time.perf_counter() - self._packet_time
-            if delta > 1:
-                self.pps = 0 if delta == 0 else (self._packet_count / delta)
-                self._packet_count = 0
-                self._packet_time = time.perf_counter()
+                packet = bytes(datagram.data())
+            self._count_packets(1)
+            self.process_packet(packet)
+
+    @QtCore.pyqtSlot()
+    @profile_stage("net")
+    def read_datagram_batch(self):
+        """
+        Drains up to RECEIVE_BATCH_SIZE datagrams from the non-blocking socket
+        and parses them together.  Python has no recvmmsg() binding, but a
+        tight recv() loop avoids the three Qt calls and the QHostAddress
+        allocation that QUdpSocket costs per datagram.  If the batch fills up,
+        the notifier fires again for the rest.
+        """
+        recv = self.socket.recv
+        batch = []
+        try:
+            while len(batch) < RECEIVE_BATCH_SIZE:
+                batch.append(recv(MAX_DATAGRAM_SIZE))
+        except BlockingIOError:
+            pass
+
+        if len(batch) > 0:
+            self.process_batch(batch)
+
+    def process_batch(self, packets):
+        self._count_packets(len(packets))
+        for packet in packets:
             self.process_packet(packet)
 
+    def _count_packets(self, count):
+        self.packets_received += count
+        self._packet_count += count
+        delta = time.perf_counter() - self._packet_time
+        if delta > 1:
+            self.pps = 0 if delta == 0 else (self._packet_count / delta)
+            self._packet_count = 0
+            self._packet_time = time.perf_counter()
+
     def frame_started(self):
         self.in_frame = True
 
@@ -71,24 +165,62 @@ class NetController(QtCore.QObject):
     def frame_complete(self):
         self.in_frame = False
 
+    @profile_stage("parse")
     def process_packet(self, packet):
+        """
+        Parses a single FireMix datagram.  `packet` is any bytes-like object;
+        strand payloads are stored as read-only uint8 views onto it, so the
+        caller must not reuse the underlying buffer for the next datagram.
+        """
+        if len(packet) == 0:
+            log.error("Received empty packet!")
+            self.malformed_packets += 1
+            return
+
+        if self._frame_received_at is None:
+            self._frame_received_at = time.perf_counter()
+
         cmd = chr(packet[0])
         datalen = 0
 
         # Begin frame
         if cmd == 'B':
+            if self.in_frame:
+                # The previous frame never saw its 'E' packet
+                self.dropped_frames += 1
+            # A new frame starts here, even if the last one was never completed
+            self._frame_received_at = time.perf_counter()
             self.frame_started()
 
         # Unpack strand pixel data
         elif cmd == 'S':
             strand = packet[1]
             datalen = (packet[3] << 8) + packet[2]
-            data = [c for c in packet[4:]]
+            data = np.frombuffer(packet, dtype=np.uint8, offset=4)
             self._frame_data[strand] = data
 
         # End frame
         elif cmd == 'E':
-            self.new_frame.emit(self._frame_data)
+            self.frame_complete()
+            completed_at = time.perf_counter()
+            metrics.record("receive_to_complete",
+                           completed_at - self._frame_received_at)
+
+            if self.frame_buffer is not None:
+                # Strands that were not resent keep their previous data, so
+                # publish a snapshot rather than the dict we keep updating.
+                frame = Frame(self._frame_data)
+            else:
+                frame = self._frame_data
+            frame.received_at = self._frame_received_at
+            frame.completed_at = completed_at
+            self._frame_received_at = None
+            self.frames_completed += 1
+
+            if self.frame_buffer is not None:
+                if self.frame_buffer.publish(frame):
+                    self.frame_ready.emit()
+            self.new_frame.emit(frame)
 
             self._frame_count += 1
             delta = time.perf_counter() - self._frame_time
@@ -99,3 +231,4 @@ class NetController(QtCore.QObject):
 
         else:
             log.error("Malformed packet of length %d!" % len(packet))
+            self.malformed_packets += 1
@@ -0,0 +1,137 @@
+import logging as log
+import time
+
+from PyQt5 import QtCore
+
+from lib.capture import CaptureReader
+
+
+class PlaybackController(QtCore.QObject):
+    """
+    Plays a capture file back through new_frame, which has the same
+    signature as NetController.new_frame, so it can be connected straight to
+    CanvasController.on_new_frame.
+
+    `speed` is a multiple of real time (1.0 plays at the recorded rate).  A
+    speed of 0 emits frames as fast as possible, a batch at a time so the
+    event loop keeps running.  Every frame is emitted, in order, so playback
+    is deterministic regardless of speed.
+    """
+
+    new_frame = QtCore.pyqtSignal(dict)
+    finished = QtCore.pyqtSignal()
+
+    # How long to emit frames for per timer tick in as-fast-as-possible mode
+    FAST_BATCH_SECONDS = 0.01
+
+    def __init__(self, path, speed=1.0, loop=False):
+        super(PlaybackController, self).__init__()
+        self.reader = CaptureReader(path)
+        self.speed = speed
+        self.loop = loop
+        self.playing = False
+
+        self._position = 0
+        self._base_timestamp = 0.0
+        self._base_time = 0.0
+
+        self._frame_count = 0
+        self._frame_time = time.perf_counter()
+        self.fps = 0
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.setTimerType(QtCore.Qt.PreciseTimer)
+        self.timer.timeout.connect(self.on_timer)
+
+        log.info("Loaded capture %s: %d frames, %0.1f seconds" %
+                 (path, len(self.reader), self.reader.duration))
+
+    @property
+    def position(self):
+        """
+        Index of the next frame to be emitted
+        """
+        return self._position
+
+    @QtCore.pyqtSlot()
+    def play(self):
+        self._rebase()
+        self.playing = True
+        self.timer.start(0 if self.speed <= 0 else 5)
+
+    @QtCore.pyqtSlot()
+    def pause(self):
+        self.playing = False
+        self.timer.stop()
+
+    def set_speed(self, speed):
+        self.speed = speed
+        if self.playing:
+            self.play()
+
+    def seek(self, index):
+        """
+        Moves playback to frame index.  While paused, that frame is emitted
+        immediately so the display reflects the new position.
+        """
+        if len(self.reader) == 0:
+            return
+        self._position = min(max(int(index), 0), len(self.reader) - 1)
+        self._rebase()
+        if not self.playing:
+            self._emit_next()
+
+    def seek_time(self, timestamp):
+        """
+        Moves playback to the last frame at or before timestamp (seconds
+        since the start of the capture).
+        """
+        self.seek(self.reader.find_frame(timestamp))
+
+    def close(self):
+        self.pause()
+        self.reader.close()
+
+    def _rebase(self):
+        """
+        Anchors the playback clock so that the next frame is due now.
+        """
+        if self._position < len(self.reader):
+            self._base_timestamp = self.reader.timestamps[self._position]
+        self._base_time = time.perf_counter()
+
+    def _emit_next(self):
+        timestamp, frame = self.reader.read_frame(self._position)
+        self._position += 1
+        self.new_frame.emit(frame)
+
+        self._frame_count += 1
+        delta = time.perf_counter() - self._frame_time
+        if delta > 1:
+            self.fps = self._frame_count / delta
+            self._frame_count = 0
+            self._frame_time = time.perf_counter()
+
+    @QtCore.pyqtSlot()
+    def on_timer(self):
+        num_frames = len(self.reader)
+
+        if self.speed <= 0:
+            deadline = time.perf_counter() + self.FAST_BATCH_SECONDS
+            while self._position < num_frames and time.perf_counter() < deadline:
+                self._emit_next()
+        else:
+            elapsed = (time.perf_counter() - self._base_time) * self.speed
+            due = self._base_timestamp + elapsed
+            timestamps = self.reader.timestamps
+            while (self._position < num_frames and
+                   timestamps[self._position] <= due):
+                self._emit_next()
+
+        if self._position >= num_frames:
+            if self.loop and num_frames > 0:
+                self._position = 0
+                self._rebase()
+            else:
+                self.pause()
+                self.finished.emit()
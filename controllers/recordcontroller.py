@@ -0,0 +1,71 @@
+import logging as log
+import queue
+import threading
+import time
+
+from PyQt5 import QtCore
+
+from lib.capture import CaptureWriter
+
+
+class RecordController(QtCore.QObject):
+    """
+    Records frames from NetController.new_frame to a capture file.
+
+    Frames are handed to a writer thread through a bounded queue, so a slow
+    disk never holds up the receive path: if the queue is full the frame is
+    dropped and counted in dropped_frames instead.  on_new_frame is safe to
+    call from the network thread, so connect it with Qt.DirectConnection
+    when NetController runs on its own thread.
+    """
+
+    def __init__(self, path, compress=False, max_pending=256):
+        super(RecordController, self).__init__()
+        self.path = path
+        self.dropped_frames = 0
+
+        self._writer = CaptureWriter(path, compress, time.time())
+        self._start_time = time.perf_counter()
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run,
+                                        name="firesim-recorder")
+        self._thread.daemon = True
+        self._thread.start()
+        log.info("Recording frames to %s" % path)
+
+    @property
+    def frames_written(self):
+        return self._writer.frames_written
+
+    @QtCore.pyqtSlot(dict)
+    def on_new_frame(self, frame):
+        # NetController keeps updating the dict it emits, so take a snapshot.
+        # The strand payloads themselves are immutable.
+        item = (time.perf_counter() - self._start_time, dict(frame))
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped_frames += 1
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            try:
+                self._writer.write_frame(*item)
+            except Exception:
+                log.exception("Error writing capture file %s; recording stopped"
+                              % self.path)
+                break
+        self._writer.close()
+
+    def close(self):
+        """
+        Writes any queued frames and closes the capture file.
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        log.info("Recorded %d frames (%d dropped) to %s" %
+                 (self.frames_written, self.dropped_frames, self.path))
@@ -7,17 +7,23 @@ import os.path
 from OpenGL import GL
 
 from PyQt5.QtCore import (pyqtProperty, pyqtSignal, pyqtSlot, QObject, QUrl,
-                          QTimer, QSize, QRect)
+                          QTimer, QSize, QRect, QThread, Qt)
 from PyQt5.QtQml import qmlRegisterType, QQmlComponent
 from PyQt5.QtQuick import QQuickView
 from PyQt5.QtWidgets import QApplication, QFileDialog
-from PyQt5.QtGui import QIcon
+from PyQt5.QtGui import QIcon, QSurfaceFormat
 
 from ui.canvasview import CanvasView
 
 from lib.config import Config
+from lib.frame_scheduler import FrameScheduler
+from lib.metrics_server import MetricsServer, pipeline_samples
+from lib.profiler import profiler, setup_profiling
+from lib.triple_buffer import TripleBuffer
 from models.scene import Scene
 from controllers.netcontroller import NetController
+from controllers.recordcontroller import RecordController
+from controllers.playbackcontroller import PlaybackController
 
 
 class FireSimGUI(QObject):
@@ -25,17 +31,17 @@ class FireSimGUI(QObject):
     def __init__(self, args=None):
         QObject.__init__(self)
 
+        # Sync buffer swaps to the display's refresh where the driver allows
+        surface_format = QSurfaceFormat.defaultFormat()
+        surface_format.setSwapInterval(1)
+        QSurfaceFormat.setDefaultFormat(surface_format)
+
         self.app = QApplication(["FireSim"])
         self.app.aboutToQuit.connect(self.about_to_quit)
         self.args = args
         self.config = Config("data/config.json")
 
-        if self.args.profile:
-            try:
-                import yappi
-                yappi.start()
-            except ImportError:
-                log.error("Could not enable YaPPI profiling")
+        setup_profiling(self.args)
 
         self.selected_fixture = None
         self.is_blurred = False
@@ -64,22 +70,64 @@ class FireSimGUI(QObject):
         self.canvas = self.root.findChild(CanvasView)
         self.canvas.gui = self
         self.canvas.model.scene = self.scene
-        self.canvas.update_target_fps.connect(self.set_target_fps)
 
         self.set_properties_from_scene()
 
-        #self.net_thread = QThread()
-        #self.net_thread.start()
-        self.netcontroller = NetController(self)
-        #self.netcontroller.moveToThread(self.net_thread)
-        #self.netcontroller.start.emit()
-
-        self.redraw_timer = QTimer()
-        self.set_target_fps(60)
-        self.redraw_timer.timeout.connect(self.canvas.update)
-        self.redraw_timer.start()
-
-        self.netcontroller.new_frame.connect(self.canvas.controller.on_new_frame)
+        # Repaints happen when a frame arrives or the canvas changes, capped
+        # at --max-fps, rather than on a free-running timer
+        self.target_fps = self.args.max_fps
+        self.scheduler = FrameScheduler(self.target_fps)
+        self.scheduler.render.connect(self.canvas.repaint)
+        self.view.frameSwapped.connect(self.scheduler.frame_presented)
+        self.canvas.nothing_to_present.connect(self.scheduler.frame_presented)
+        self.canvas.repaint_requested.connect(self.scheduler.request_update)
+        self.scene.changed.connect(self.scheduler.request_update)
+        self.scene.pixel_group_repaint_needed.connect(
+            self.canvas.invalidate_pixel_group)
+
+        if self.args.net_thread:
+            self.frame_buffer = TripleBuffer()
+            self.canvas.controller.frame_buffer = self.frame_buffer
+            self.net_thread = QThread()
+            self.netcontroller = NetController(self, self.frame_buffer,
+                                               self.args.net_backend)
+            self.netcontroller.frame_ready.connect(
+                self.scheduler.request_update)
+            self.netcontroller.moveToThread(self.net_thread)
+            self.net_thread.start()
+        else:
+            self.net_thread = None
+            self.netcontroller = NetController(self,
+                                               backend=self.args.net_backend)
+            self.netcontroller.new_frame.connect(
+                self.canvas.controller.on_new_frame)
+            self.netcontroller.new_frame.connect(
+                self.scheduler.request_update)
+
+        self.recorder = None
+        if self.args.record is not None:
+            self.recorder = RecordController(self.args.record,
+                                             self.args.record_compress)
+            # Direct, so frames are queued for writing on whichever thread
+            # received them
+            self.netcontroller.new_frame.connect(self.recorder.on_new_frame,
+                                                 Qt.DirectConnection)
+
+        self.playback = None
+        if self.args.playback is not None:
+            self.playback = PlaybackController(self.args.playback,
+                                               self.args.playback_speed,
+                                               self.args.playback_loop)
+            self.playback.new_frame.connect(
+                self.canvas.controller.on_new_frame)
+            self.playback.new_frame.connect(self.scheduler.request_update)
+            self.playback.play()
+
+        self.metrics_server = None
+        if self.args.metrics_port is not None:
+            self.metrics_server = MetricsServer(self.metric_samples,
+                                                self.args.metrics_port)
+            self.metrics_server.start()
 
         geom_str = self.config.get("window-geometry", None)
         if geom_str is not None:
@@ -99,13 +147,21 @@ class FireSimGUI(QObject):
         self.canvas.setWidth(cw)
         self.canvas.setHeight(ch)
 
+    def metric_samples(self):
+        """
+        Called from the metrics server thread; only reads counters
+        """
+        samples = pipeline_samples(self.netcontroller,
+                                   self.canvas.controller.frame_buffer)
+        samples.append(("firesim_render_fps", "gauge",
+                        "Canvas paints per second", self.canvas.fps))
+        return samples
+
     @pyqtSlot(float)
     def set_target_fps(self, fps):
         log.info("Target FPS: %d" % fps)
         self.target_fps = fps
-        self.redraw_timer.stop()
-        self.redraw_timer.setInterval(1 / fps)
-        self.redraw_timer.start()
+        self.scheduler.set_max_fps(fps)
 
     @pyqtSlot()
     def about_to_quit(self):
@@ -113,6 +169,7 @@ class FireSimGUI(QObject):
         self.config["window-geometry"] = [rect.x(), rect.y(),
                                           rect.width(), rect.height()]
         self.config.save()
+        profiler.stop()
 
     @pyqtSlot()
     def quit(self):
@@ -124,17 +181,19 @@ class FireSimGUI(QObject):
 
     def on_close(self, e):
         self.netcontroller.running = False
-        #self.net_thread.quit()
-        if self.args.profile:
-            try:
-                import yappi
-                yappi.get_func_stats().print_all()
-            except ImportError:
-                pass
+        if self.net_thread is not None:
+            self.net_thread.quit()
+            self.net_thread.wait()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.playback is not None:
+            self.playback.close()
+        if self.metrics_server is not None:
+            self.metrics_server.close()
 
     @pyqtSlot()
     def on_network_event(self):
-        self.canvas.update()
+        self.scheduler.request_update()
 
     @pyqtSlot()
     def on_btn_open(self):
@@ -143,18 +202,20 @@ class FireSimGUI(QObject):
                                                 "Scene Files (*.json)")
         if len(file_name[0]) > 0:
             self.scene.save()
-            self.redraw_timer.stop()
             self.scene.set_filepath_and_load(file_name[0])
             self.config['last-opened-scene'] = file_name[0]
             self.config.save()
             self.set_properties_from_scene()
-            self.redraw_timer.start()
+            self.canvas.model.mark_dirty()
+            self.scheduler.request_update()
 
     @pyqtSlot()
     def on_btn_new(self):
         self.scene.save()
         self.scene.new()
         self.set_properties_from_scene()
+        self.canvas.model.mark_dirty()
+        self.scheduler.request_update()
 
     @pyqtSlot()
     def on_btn_save(self):
@@ -174,3 +235,5 @@ class FireSimGUI(QObject):
 
         if len(file_name[0]) > 0:
             self.scene.backdrop_filepath = file_name[0]
+            self.canvas.model.mark_dirty()
+            self.scheduler.request_update()
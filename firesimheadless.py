@@ -0,0 +1,148 @@
+import logging as log
+import sys
+import time
+
+from PyQt5.QtCore import pyqtSlot, QCoreApplication, QObject, QThread, QTimer, Qt
+
+from lib.config import Config
+from lib.instrumentation import metrics
+from lib.metrics_server import MetricsServer, pipeline_samples
+from lib.profiler import profiler, setup_profiling
+from lib.triple_buffer import TripleBuffer
+from models.scene import Scene
+from controllers.canvascontroller import CanvasController
+from controllers.netcontroller import NetController
+from controllers.recordcontroller import RecordController
+from controllers.playbackcontroller import PlaybackController
+
+
+class FireSimHeadless(QObject):
+    """
+    Runs the receive and frame pipeline without any windows, for servers and
+    CI machines with no display.  Frames end up in a CanvasController's model
+    exactly as they do in the GUI; stats are printed periodically and are
+    available from stats().
+    """
+
+    # How often the pipeline is serviced (threaded frame swaps, stats output)
+    TICK_INTERVAL_MS = 100
+
+    def __init__(self, args=None):
+        QObject.__init__(self)
+
+        self.app = QCoreApplication(["FireSim"])
+        self.args = args
+        self.config = Config("data/config.json")
+
+        setup_profiling(self.args)
+
+        scene_file_path = (self.args.scene if self.args.scene is not None
+                           else self.config.get("last-opened-scene"))
+        self.scene = Scene(scene_file_path)
+
+        self.controller = CanvasController(None)
+        self.controller.model.scene = self.scene
+
+        self.frame_buffer = None
+        if self.args.net_thread:
+            self.frame_buffer = TripleBuffer()
+            self.controller.frame_buffer = self.frame_buffer
+            self.net_thread = QThread()
+            self.netcontroller = NetController(self, self.frame_buffer,
+                                               self.args.net_backend)
+            self.netcontroller.moveToThread(self.net_thread)
+            self.net_thread.start()
+        else:
+            self.net_thread = None
+            self.netcontroller = NetController(self,
+                                               backend=self.args.net_backend)
+            self.netcontroller.new_frame.connect(self.controller.on_new_frame)
+
+        self.recorder = None
+        if self.args.record is not None:
+            self.recorder = RecordController(self.args.record,
+                                             self.args.record_compress)
+            self.netcontroller.new_frame.connect(self.recorder.on_new_frame,
+                                                 Qt.DirectConnection)
+
+        self.playback = None
+        if self.args.playback is not None:
+            self.playback = PlaybackController(self.args.playback,
+                                               self.args.playback_speed,
+                                               self.args.playback_loop)
+            self.playback.new_frame.connect(self.controller.on_new_frame)
+            self.playback.play()
+
+        self.metrics_server = None
+        if self.args.metrics_port is not None:
+            self.metrics_server = MetricsServer(self.metric_samples,
+                                                self.args.metrics_port)
+            self.metrics_server.start()
+
+        self._last_stats_time = time.perf_counter()
+        self.tick_timer = QTimer()
+        self.tick_timer.timeout.connect(self.on_tick)
+        self.tick_timer.start(self.TICK_INTERVAL_MS)
+
+        log.info("FireSim running headless with scene %s" % self.scene.name)
+
+    def stats(self):
+        """
+        Returns a dict of the current pipeline statistics
+        """
+        stats = {
+            "net_pps": self.netcontroller.pps,
+            "net_fps": self.netcontroller.fps,
+            "net_packets_received": self.netcontroller.packets_received,
+            "net_dropped_frames": self.netcontroller.dropped_frames,
+            "strands_with_data": len(self.controller.model.color_data),
+        }
+        if self.frame_buffer is not None:
+            stats["overwritten_frames"] = self.frame_buffer.overwritten
+        if self.recorder is not None:
+            stats["recorded_frames"] = self.recorder.frames_written
+            stats["record_dropped_frames"] = self.recorder.dropped_frames
+        if self.playback is not None:
+            stats["playback_fps"] = self.playback.fps
+            stats["playback_position"] = self.playback.position
+        # Nothing is painted headless, so only the stages up to the handoff
+        for stage in ("receive_to_complete", "complete_to_handoff"):
+            latency = metrics.histograms[stage].summary()
+            if latency["p50_ms"] is not None:
+                stats[stage + "_p50_ms"] = latency["p50_ms"]
+                stats[stage + "_p99_ms"] = latency["p99_ms"]
+        return stats
+
+    def metric_samples(self):
+        return pipeline_samples(self.netcontroller, self.frame_buffer)
+
+    @pyqtSlot()
+    def on_tick(self):
+        self.controller.swap_frame()
+
+        interval = self.args.stats_interval
+        now = time.perf_counter()
+        if interval > 0 and now - self._last_stats_time >= interval:
+            self._last_stats_time = now
+            print(" ".join("%s=%s" % (k, ("%0.1f" % v) if isinstance(v, float) else v)
+                           for k, v in sorted(self.stats().items())))
+            sys.stdout.flush()
+
+    @pyqtSlot()
+    def quit(self):
+        self.tick_timer.stop()
+        self.netcontroller.running = False
+        if self.net_thread is not None:
+            self.net_thread.quit()
+            self.net_thread.wait()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.playback is not None:
+            self.playback.close()
+        if self.metrics_server is not None:
+            self.metrics_server.close()
+        profiler.stop()
+        self.app.quit()
+
+    def run(self):
+        return self.app.exec_()
@@ -4,6 +4,33 @@ import sys
 
 def parse_args():
     parser = argparse.ArgumentParser(description="FireSim")
-    parser.add_argument("--profile", action='store_const', const=True, default=False, help="Enable profiling")
+    parser.add_argument("--profile", action='store_const', const=True, default=False,
+                        help="Start the sampling profiler (it can also be toggled with F9 or SIGUSR1)")
+    parser.add_argument("--profile-dir", type=str, default="profiles",
+                        help="Directory for profile snapshots (collapsed-stack .folded files)")
+    parser.add_argument("--profile-interval", type=float, default=60.0,
+                        help="Seconds between profile snapshots")
     parser.add_argument('--scene', type=str, help="Scene to load")
+    parser.add_argument("--net-thread", action='store_const', const=True, default=False,
+                        help="Receive network data on a separate thread")
+    parser.add_argument("--net-backend", choices=["qt", "socket"], default="qt",
+                        help="Read datagrams through QUdpSocket (qt) or in batches from a plain socket (socket)")
+    parser.add_argument("--record", type=str, metavar="FILE",
+                        help="Record received frames to a capture file")
+    parser.add_argument("--record-compress", action='store_const', const=True, default=False,
+                        help="zlib-compress recorded frames")
+    parser.add_argument("--playback", type=str, metavar="FILE",
+                        help="Play back frames from a capture file")
+    parser.add_argument("--playback-speed", type=float, default=1.0,
+                        help="Playback speed as a multiple of real time (0 = as fast as possible)")
+    parser.add_argument("--playback-loop", action='store_const', const=True, default=False,
+                        help="Restart playback when the capture ends")
+    parser.add_argument("--headless", action='store_const', const=True, default=False,
+                        help="Run without a GUI (receive and process frames only)")
+    parser.add_argument("--stats-interval", type=float, default=5.0,
+                        help="Seconds between stats lines in headless mode (0 to disable)")
+    parser.add_argument("--max-fps", type=float, default=60.0,
+                        help="Upper limit on canvas repaints per second")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                        help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics")
     return parser.parse_args()
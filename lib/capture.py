@@ -0,0 +1,199 @@
+"""
+Capture files store the frames FireMix sends to FireSim so that shows can
+be analyzed and replayed offline.
+
+All integers are little-endian.  A capture starts with a file header:
+
+    magic       6s   b"FSCAP\\0"
+    version     B    CAPTURE_VERSION
+    flags       B    FLAG_ZLIB if frame bodies are zlib-compressed
+    start_time  d    wall-clock time (seconds since the epoch) of frame 0
+
+followed by any number of frame records, appended one after another:
+
+    length      I    number of bytes in the body
+    timestamp   d    seconds since start_time
+    strands     H    number of strands in the body
+    body        length bytes (zlib-compressed if FLAG_ZLIB is set)
+
+The uncompressed body is, for each strand:
+
+    strand      H    strand number
+    size        I    number of payload bytes
+    payload     size bytes of RGB data, as received
+
+Since every record starts with its length, a reader can index a capture
+without decoding any bodies.
+"""
+import logging
+import mmap
+import struct
+import zlib
+
+import numpy as np
+
+CAPTURE_MAGIC = b"FSCAP\0"
+CAPTURE_VERSION = 1
+
+FLAG_ZLIB = 0x01
+
+log = logging.getLogger("firesim.lib.capture")
+
+FILE_HEADER = struct.Struct("<6sBBd")
+FRAME_HEADER = struct.Struct("<IdH")
+STRAND_HEADER = struct.Struct("<HI")
+
+
+class CaptureWriter(object):
+    """
+    Appends frames to a capture file.  Writes go through a buffered file, so
+    call close() (or flush()) to make sure everything reaches the disk.
+    """
+
+    def __init__(self, path, compress=False, start_time=0.0,
+                 buffer_size=1 << 20):
+        self.path = path
+        self.compress = compress
+        self.frames_written = 0
+        self._file = open(path, "wb", buffering=buffer_size)
+        self._file.write(FILE_HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION,
+                                          FLAG_ZLIB if compress else 0,
+                                          start_time))
+
+    def write_frame(self, timestamp, frame):
+        """
+        Writes one frame.  `frame` maps strand numbers to uint8 RGB payloads
+        (anything np.asarray can turn into bytes).
+        """
+        chunks = []
+        for strand in sorted(frame):
+            payload = np.asarray(frame[strand], dtype=np.uint8).tobytes()
+            chunks.append(STRAND_HEADER.pack(strand, len(payload)))
+            chunks.append(payload)
+        body = b"".join(chunks)
+        if self.compress:
+            body = zlib.compress(body, 1)
+
+        self._file.write(FRAME_HEADER.pack(len(body), timestamp, len(frame)))
+        self._file.write(body)
+        self.frames_written += 1
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+class CaptureReader(object):
+    """
+    Reads a capture file through a read-only memory map, so captures much
+    larger than RAM can be played back.  Opening a capture only walks the
+    frame headers to build an index of record offsets and timestamps.
+
+    Frames from uncompressed captures are returned as uint8 views onto the
+    mapping.  Drop any frames you are still holding before calling close().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError("Capture file %s is empty." % path)
+
+        if len(self._mmap) < FILE_HEADER.size:
+            self.close()
+            raise ValueError("Capture file %s is truncated." % path)
+
+        magic, version, flags, start_time = FILE_HEADER.unpack_from(self._mmap)
+        if magic != CAPTURE_MAGIC:
+            self.close()
+            raise ValueError("%s is not a capture file." % path)
+        if version != CAPTURE_VERSION:
+            self.close()
+            raise ValueError("Unsupported capture file version %d in %s" %
+                             (version, path))
+
+        self.compressed = bool(flags & FLAG_ZLIB)
+        self.start_time = start_time
+        self._build_index()
+
+    def _build_index(self):
+        offsets = []
+        timestamps = []
+        data = self._mmap
+        size = len(data)
+        offset = FILE_HEADER.size
+        unpack = FRAME_HEADER.unpack_from
+        header_size = FRAME_HEADER.size
+
+        while offset + header_size <= size:
+            length, timestamp, _ = unpack(data, offset)
+            if offset + header_size + length > size:
+                break
+            offsets.append(offset)
+            timestamps.append(timestamp)
+            offset += header_size + length
+
+        if offset != size:
+            log.warning("Ignoring truncated frame at the end of %s" % self.path)
+
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.timestamps = np.array(timestamps, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    @property
+    def duration(self):
+        return self.timestamps[-1] if len(self) > 0 else 0.0
+
+    def find_frame(self, timestamp):
+        """
+        Returns the index of the last frame at or before timestamp (seconds
+        since the start of the capture), or 0 if there is none.
+        """
+        index = np.searchsorted(self.timestamps, timestamp, side="right") - 1
+        return max(int(index), 0)
+
+    def read_frame(self, index):
+        """
+        Returns (timestamp, frame) for the frame at index, where frame maps
+        strand numbers to uint8 RGB payloads.
+        """
+        offset = int(self.offsets[index])
+        length, timestamp, num_strands = FRAME_HEADER.unpack_from(self._mmap,
+                                                                  offset)
+        offset += FRAME_HEADER.size
+
+        if self.compressed:
+            body = zlib.decompress(self._mmap[offset:offset + length])
+            offset = 0
+        else:
+            body = self._mmap
+
+        frame = {}
+        for _ in range(num_strands):
+            strand, count = STRAND_HEADER.unpack_from(body, offset)
+            offset += STRAND_HEADER.size
+            frame[strand] = np.frombuffer(body, dtype=np.uint8, count=count,
+                                          offset=offset)
+            offset += count
+
+        return timestamp, frame
+
+    def close(self):
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Frames handed out still reference the mapping; it will be
+                # released when they are garbage collected.
+                pass
+            self._mmap = None
+        self._file.close()
@@ -0,0 +1,106 @@
+import math
+import time
+
+from PyQt5.QtCore import QObject, QTimer, Qt, pyqtSignal, pyqtSlot
+
+
+class FrameScheduler(QObject):
+    """
+    Decides when the canvas repaints, instead of a free-running redraw timer.
+
+    Anything that changes what is on screen (a new network frame, user input,
+    a model change) calls request_update().  Requests are coalesced, and
+    `render` is emitted at most `max_fps` times a second.  Nothing is
+    emitted while nothing changes, apart from a slow `idle_fps` refresh that
+    keeps the stats overlay current.
+
+    Once frame_presented() has been called (connect it to the window's
+    frameSwapped signal), no render is emitted while the previous one is
+    still waiting for its buffer swap.  The window then paints at most once
+    per vsync, and a request arriving in the meantime is served right after
+    the swap.  A render that turns out to have nothing to paint should also
+    call frame_presented(), since no swap will follow it.  A presentation
+    that never arrives (e.g. the window is hidden) stops blocking renders
+    after PRESENT_TIMEOUT seconds, so a deferred request is never lost.
+    """
+
+    render = pyqtSignal()
+
+    PRESENT_TIMEOUT = 0.25
+
+    def __init__(self, max_fps=60, idle_fps=2):
+        super(FrameScheduler, self).__init__()
+        self._min_interval = 0
+        self._last_render = -math.inf
+        self._presents_seen = False
+        self._awaiting_present = False
+        self._deferred = False
+        self.renders = 0
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(Qt.PreciseTimer)
+        self._timer.timeout.connect(self._on_timeout)
+
+        self._idle_timer = QTimer(self)
+        self._idle_timer.timeout.connect(self.request_update)
+
+        self.set_max_fps(max_fps)
+        self.set_idle_fps(idle_fps)
+
+    @property
+    def max_fps(self):
+        return 1.0 / self._min_interval
+
+    @pyqtSlot(float)
+    def set_max_fps(self, fps):
+        if fps <= 0:
+            raise ValueError("max_fps must be positive")
+        self._min_interval = 1.0 / fps
+
+    @pyqtSlot(float)
+    def set_idle_fps(self, fps):
+        """
+        Sets how often the canvas repaints when nothing changes (0 to never)
+        """
+        self._idle_timer.stop()
+        if fps > 0:
+            self._idle_timer.start(int(round(1000.0 / fps)))
+
+    @pyqtSlot()
+    def request_update(self):
+        if self._timer.isActive():
+            return
+
+        now = time.perf_counter()
+        if self._presents_seen and self._awaiting_present:
+            remaining = self.PRESENT_TIMEOUT - (now - self._last_render)
+            if remaining > 0:
+                self._deferred = True
+                self._timer.start(int(math.ceil(remaining * 1000)))
+                return
+
+        wait = self._min_interval - (now - self._last_render)
+        self._timer.start(int(math.ceil(wait * 1000)) if wait > 0 else 0)
+
+    @pyqtSlot()
+    def frame_presented(self):
+        self._presents_seen = True
+        self._awaiting_present = False
+        if self._deferred:
+            # Serve the deferred request now instead of at the timeout
+            self._deferred = False
+            self._timer.stop()
+            self.request_update()
+
+    def stop(self):
+        self._timer.stop()
+        self._idle_timer.stop()
+
+    @pyqtSlot()
+    def _on_timeout(self):
+        self._last_render = time.perf_counter()
+        self._awaiting_present = True
+        self._deferred = False
+        self.renders += 1
+        self.render.emit()
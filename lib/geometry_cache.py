@@ -0,0 +1,99 @@
+"""
+On-disk cache of arrays derived from scene geometry (pixel locations,
+neighbor graphs, intersection points...), so that a big scene does not
+have to recompute them every time it is opened.
+
+Arrays live next to the scene file, in a directory named after it
+(scenes/lotus.json -> scenes/.lotus.json.cache/), one .npy file each, and
+are memory-mapped read-only when loaded.  The directory's manifest records
+the key the arrays were derived from (a hash of the scene's geometry).  If
+the key differs, everything in the directory is stale and is discarded.
+
+Failing to read or write the cache is never an error: the array is simply
+rebuilt and, if it cannot be saved, logged and used from memory.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+import numpy as np
+
+log = logging.getLogger("firesim.lib.geometry_cache")
+
+MANIFEST = "manifest.json"
+
+# Bump when the layout or meaning of any cached array changes
+FORMAT_VERSION = 2
+
+
+def content_hash(data):
+    """
+    Returns a hex digest of a JSON-serializable object, independent of dict
+    ordering
+    """
+    text = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def sidecar_directory(path):
+    directory, name = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, ".%s.cache" % name)
+
+
+class GeometryCache(object):
+    """
+    The arrays cached for one version of one scene.  `key` identifies the
+    geometry they were derived from.
+    """
+
+    def __init__(self, directory, key):
+        self.directory = directory
+        self.key = "%d:%s" % (FORMAT_VERSION, key)
+        self._valid = None
+
+    def get(self, name, build):
+        """
+        Returns the cached array called `name`, memory-mapped read-only.  If
+        there is none, calls build() to make it and saves the result.
+        """
+        path = os.path.join(self.directory, name + ".npy")
+        if self._is_valid() and os.path.exists(path):
+            try:
+                return np.load(path, mmap_mode="r")
+            except (OSError, ValueError) as e:
+                log.warning("Discarding unreadable cache file %s: %s" % (path, e))
+
+        array = np.asarray(build())
+        self._save(path, array)
+        return array
+
+    def _is_valid(self):
+        if self._valid is None:
+            try:
+                with open(os.path.join(self.directory, MANIFEST)) as f:
+                    self._valid = json.load(f).get("key") == self.key
+            except (OSError, ValueError):
+                self._valid = False
+        return self._valid
+
+    def _save(self, path, array):
+        try:
+            if not self._is_valid():
+                self._clear()
+            tmp_path = "%s.%d.tmp" % (path, os.getpid())
+            with open(tmp_path, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            log.warning("Could not cache scene geometry in %s: %s" %
+                        (self.directory, e))
+
+    def _clear(self):
+        if os.path.isdir(self.directory):
+            shutil.rmtree(self.directory)
+        os.makedirs(self.directory)
+        with open(os.path.join(self.directory, MANIFEST), "w") as f:
+            json.dump({"key": self.key}, f)
+        self._valid = True
@@ -0,0 +1,104 @@
+"""
+Latency instrumentation for the network-to-pixel pipeline.
+
+Timestamps come from time.perf_counter() (monotonic).  A frame is stamped
+when its first packet is parsed and when its 'E' packet completes it
+(see NetController.Frame).  It is stamped again when CanvasController
+takes it, and when the paint that first shows it finishes.  The gaps
+between those points are recorded into the module-level `metrics`
+instance:
+
+    receive_to_complete   first packet of a frame -> its 'E' packet
+    complete_to_handoff   'E' packet -> CanvasController.on_new_frame
+    handoff_to_paint      on_new_frame -> end of the paint that shows it
+    glass_to_glass        first packet -> end of the paint that shows it
+    paint                 duration of every CanvasView.paint
+
+Use metrics.summary() to read them programmatically, or serve them over
+HTTP with lib.metrics_server.
+"""
+import bisect
+import threading
+
+import numpy as np
+
+STAGES = ("receive_to_complete", "complete_to_handoff", "handoff_to_paint",
+          "glass_to_glass", "paint")
+
+# Upper bounds (seconds) of the lifetime histogram buckets, as exported to
+# Prometheus.  Samples above the last bound only land in the +Inf bucket.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+           0.5, 1.0)
+
+
+class RollingHistogram(object):
+    """
+    Keeps the most recent `window` samples (in seconds) and reports
+    percentiles over them, plus lifetime count, sum and bucket counts (see
+    BUCKETS).  Safe to add to from several threads.
+    """
+
+    def __init__(self, window=1024):
+        self._samples = np.zeros(window, dtype=np.float64)
+        self._next = 0
+        self._filled = 0
+        self.count = 0
+        self.total = 0.0
+        self._bucket_counts = np.zeros(len(BUCKETS) + 1, dtype=np.int64)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples[self._next] = seconds
+            self._next = (self._next + 1) % len(self._samples)
+            self._filled = min(self._filled + 1, len(self._samples))
+            self.count += 1
+            self.total += seconds
+            self._bucket_counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+
+    def samples(self):
+        with self._lock:
+            return self._samples[:self._filled].copy()
+
+    def buckets(self):
+        """
+        Returns a list of (upper bound, cumulative count) pairs over the
+        lifetime of the histogram, ending with (inf, count).
+        """
+        with self._lock:
+            counts = np.cumsum(self._bucket_counts)
+        return list(zip(BUCKETS + (float("inf"),), counts.tolist()))
+
+    def summary(self):
+        """
+        Returns a dict with the lifetime count and the p50/p95/p99/max of the
+        current window, in milliseconds (None if there are no samples).
+        """
+        samples = self.samples()
+        if len(samples) == 0:
+            p50 = p95 = p99 = peak = None
+        else:
+            p50, p95, p99 = np.percentile(samples, (50, 95, 99)) * 1000
+            peak = samples.max() * 1000
+        return {"count": self.count, "p50_ms": p50, "p95_ms": p95,
+                "p99_ms": p99, "max_ms": peak}
+
+
+class Instrumentation(object):
+
+    def __init__(self, window=1024):
+        self.histograms = dict((stage, RollingHistogram(window))
+                               for stage in STAGES)
+
+    def record(self, stage, seconds):
+        self.histograms[stage].add(seconds)
+
+    def summary(self):
+        """
+        Returns {stage: RollingHistogram.summary()} for every stage
+        """
+        return dict((stage, hist.summary())
+                    for stage, hist in self.histograms.items())
+
+
+metrics = Instrumentation()
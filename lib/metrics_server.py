@@ -0,0 +1,131 @@
+"""
+Serves pipeline metrics in the Prometheus text exposition format, e.g.
+
+    python firesim.py --metrics-port 9102
+    curl http://127.0.0.1:9102/metrics
+
+The HTTP server runs on its own daemon thread and only reads plain counters
+and the lib.instrumentation histograms, so a scrape never waits on (or
+holds up) the GUI thread.
+"""
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from lib.instrumentation import metrics
+
+log = logging.getLogger("firesim.lib.metrics_server")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def pipeline_samples(netcontroller, frame_buffer=None):
+    """
+    Returns the (name, type, help, value) samples shared by the GUI and
+    headless front ends
+    """
+    samples = [
+        ("firesim_packets_received_total", "counter",
+         "Datagrams received", netcontroller.packets_received),
+        ("firesim_packets_malformed_total", "counter",
+         "Datagrams that could not be parsed", netcontroller.malformed_packets),
+        ("firesim_frames_completed_total", "counter",
+         "Frames completed by an 'E' packet", netcontroller.frames_completed),
+        ("firesim_frames_dropped_total", "counter",
+         "Frames that never saw their 'E' packet", netcontroller.dropped_frames),
+        ("firesim_net_fps", "gauge",
+         "Frames received per second", netcontroller.fps),
+    ]
+    if frame_buffer is not None:
+        samples.append(("firesim_frames_overwritten_total", "counter",
+                        "Frames replaced before the canvas took them",
+                        frame_buffer.overwritten))
+    return samples
+
+
+def format_metrics(samples, instrumentation=metrics):
+    """
+    Renders samples (see pipeline_samples) followed by every latency
+    histogram in instrumentation as exposition text.
+    """
+    lines = []
+    for name, kind, help_text, value in samples:
+        lines.append("# HELP %s %s" % (name, help_text))
+        lines.append("# TYPE %s %s" % (name, kind))
+        lines.append("%s %s" % (name, _format_value(value)))
+
+    name = "firesim_stage_latency_seconds"
+    lines.append("# HELP %s Latency of each pipeline stage" % name)
+    lines.append("# TYPE %s histogram" % name)
+    for stage, hist in sorted(instrumentation.histograms.items()):
+        for bound, count in hist.buckets():
+            lines.append('%s_bucket{stage="%s",le="%s"} %d' %
+                         (name, stage, _format_value(bound), count))
+        lines.append('%s_sum{stage="%s"} %s' %
+                     (name, stage, _format_value(hist.total)))
+        lines.append('%s_count{stage="%s"} %d' % (name, stage, hist.count))
+
+    return "\n".join(lines) + "\n"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+class MetricsServer(object):
+    """
+    Serves format_metrics(collect()) at /metrics.  `collect` is called on the
+    server thread, so it should only read values.
+    """
+
+    def __init__(self, collect, port, host="127.0.0.1"):
+        self.collect = collect
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       name="firesim-metrics")
+        self.thread.daemon = True
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def start(self):
+        log.info("Serving metrics on http://%s:%d/metrics" %
+                 self.server.server_address[:2])
+        self.thread.start()
+
+    def close(self):
+        if self.thread.is_alive():
+            self.server.shutdown()
+        self.server.server_close()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                try:
+                    body = format_metrics(server.collect()).encode("utf-8")
+                except Exception:
+                    log.exception("Could not collect metrics")
+                    self.send_error(500)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                log.debug(format % args)
+
+        return Handler
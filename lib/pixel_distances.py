@@ -0,0 +1,142 @@
+from collections import OrderedDict
+
+import numpy as np
+from scipy import sparse, spatial
+
+# Rows of temporaries _compute needs per row of distances (dx and dy; the
+# result is written over dx)
+TEMPORARY_ROWS = 2
+
+
+class PixelDistances(object):
+    """
+    Euclidean distances between the pixels of a scene, computed on demand
+    rather than held as a dense N x N matrix (3.2 GB of float64 for a
+    20k-pixel scene).
+
+    Rows are computed in vectorized blocks and the most recently used rows
+    are cached.  No single operation holds more than `memory_budget` bytes
+    of distances, counting the temporaries used to compute them.  dense()
+    and condensed() refuse to build matrices that do not fit in the budget.
+    within() returns the radius-limited sparse form, whose size depends on
+    how many pixels are near each other rather than on N squared.
+    """
+
+    def __init__(self, locations, dtype=np.float32, memory_budget=64 << 20):
+        self.locations = np.ascontiguousarray(locations, dtype=dtype)
+        self.dtype = np.dtype(dtype)
+        self.memory_budget = memory_budget
+
+        self._row_bytes = max(len(self.locations) * self.dtype.itemsize, 1)
+        self._rows = OrderedDict()
+        self._max_cached_rows = max(
+            memory_budget // self._row_bytes - TEMPORARY_ROWS, 1)
+
+    def __len__(self):
+        return len(self.locations)
+
+    @property
+    def block_rows(self):
+        """
+        Number of rows computed per block, so that a block and its
+        temporaries fit in the memory budget
+        """
+        return self._block_rows(self.memory_budget)
+
+    def distance(self, first, second):
+        dx, dy = self.locations[first] - self.locations[second]
+        return float(np.hypot(dx, dy))
+
+    def row(self, index):
+        """
+        Returns a read-only array of the distances from pixel `index` to
+        every pixel
+        """
+        row = self._rows.get(index)
+        if row is not None:
+            self._rows.move_to_end(index)
+            return row
+
+        row = self._compute(self.locations[index:index + 1])[0]
+        row.flags.writeable = False
+        self._rows[index] = row
+        if len(self._rows) > self._max_cached_rows:
+            self._rows.popitem(last=False)
+        return row
+
+    def rows(self, indices):
+        """
+        Returns a (len(indices), N) array of distances.  Raises MemoryError
+        if it would not fit in the memory budget.
+        """
+        indices = np.asarray(indices, dtype=np.intp).reshape(-1)
+        nbytes = len(indices) * self._row_bytes
+        self._check_budget(nbytes + TEMPORARY_ROWS * self._row_bytes)
+        out = np.empty((len(indices), len(self)), dtype=self.dtype)
+        step = self._block_rows(self.memory_budget - nbytes)
+        for start in range(0, len(indices), step):
+            block = indices[start:start + step]
+            out[start:start + len(block)] = self._compute(self.locations[block])
+        return out
+
+    def iter_blocks(self):
+        """
+        Yields (first_row, block) for consecutive blocks of rows covering the
+        whole matrix, each at most block_rows rows
+        """
+        step = self.block_rows
+        for start in range(0, len(self), step):
+            yield start, self._compute(self.locations[start:start + step])
+
+    def dense(self):
+        """
+        Returns the full N x N matrix if it fits in the memory budget
+        """
+        return self.rows(np.arange(len(self)))
+
+    def condensed(self):
+        """
+        Returns the upper triangle as a condensed vector (the format of
+        scipy.spatial.distance.pdist), if it fits in the memory budget
+        """
+        n = len(self)
+        nbytes = n * (n - 1) // 2 * self.dtype.itemsize
+        self._check_budget(nbytes + TEMPORARY_ROWS * self._row_bytes)
+        out = np.empty(n * (n - 1) // 2, dtype=self.dtype)
+        step = self._block_rows(self.memory_budget - nbytes)
+        position = 0
+        for start in range(0, n - 1, step):
+            # Only the columns right of the diagonal are needed
+            block = self._compute(self.locations[start:start + step],
+                                  self.locations[start + 1:])
+            for i in range(len(block)):
+                length = n - start - i - 1
+                out[position:position + length] = block[i, i:]
+                position += length
+        return out
+
+    def within(self, radius):
+        """
+        Returns a sparse CSR matrix holding the distance between every pair
+        of pixels at most `radius` apart.  A pixel is not paired with
+        itself, and pixels at exactly the same location are not stored,
+        since their distance is zero.
+        """
+        tree = spatial.cKDTree(self.locations)
+        pairs = tree.sparse_distance_matrix(tree, radius, output_type="coo_matrix")
+        return sparse.csr_matrix(pairs, dtype=self.dtype)
+
+    def _block_rows(self, nbytes):
+        return max(nbytes // (TEMPORARY_ROWS * self._row_bytes), 1)
+
+    def _compute(self, origins, targets=None):
+        if targets is None:
+            targets = self.locations
+        dx = np.subtract.outer(origins[:, 0], targets[:, 0])
+        dy = np.subtract.outer(origins[:, 1], targets[:, 1])
+        return np.hypot(dx, dy, out=dx)
+
+    def _check_budget(self, nbytes):
+        if nbytes > self.memory_budget:
+            raise MemoryError("%d bytes of pixel distances exceeds the budget "
+                              "of %d bytes" % (nbytes, self.memory_budget))
@@ -0,0 +1,168 @@
+"""
+Continuous sampling profiler, tagged by pipeline stage.
+
+A daemon thread samples the Python stack of every other thread at a fixed
+rate.  Each sample is tagged with the pipeline stage it was taken in: the
+innermost function on the stack that was decorated with @profile_stage.
+Tagging costs nothing on the hot path, because the decorator only records
+the function's code object.
+
+Every `snapshot_interval` seconds, and when the profiler stops, the samples
+taken since the previous snapshot are written to `directory` in the
+collapsed-stack format ("stage;outer;...;inner count" per line).  It loads
+directly into speedscope, flamegraph.pl and most other flame graph viewers.
+
+The module-level `profiler` can be started and stopped at any time
+(F9 in the GUI, SIGUSR1 on Unix, or toggle() from code).
+"""
+import collections
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+
+log = logging.getLogger("firesim.lib.profiler")
+
+# Code object -> stage name, filled in by @profile_stage
+_stage_codes = {}
+
+UNTAGGED = "other"
+
+
+def profile_stage(stage):
+    """
+    Decorator: samples taken while the decorated function (or anything it
+    calls that is not itself tagged) is running are tagged with `stage`.
+    The function is returned unchanged.
+    """
+    def decorate(func):
+        _stage_codes[func.__code__] = stage
+        return func
+    return decorate
+
+
+def _frame_name(code):
+    return "%s:%s" % (os.path.basename(code.co_filename), code.co_name)
+
+
+class SamplingProfiler(object):
+
+    def __init__(self, directory="profiles", sample_interval=0.005,
+                 snapshot_interval=60.0):
+        self.directory = directory
+        self.sample_interval = sample_interval
+        self.snapshot_interval = snapshot_interval
+
+        self._samples = collections.Counter()
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.snapshots_written = 0
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run,
+                                            name="firesim-profiler")
+            self._thread.daemon = True
+            self._thread.start()
+        log.info("Profiling; snapshots every %ds to %s" %
+                 (self.snapshot_interval, self.directory))
+
+    def stop(self):
+        """
+        Stops sampling and writes out the samples taken since the last
+        snapshot
+        """
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._stop.set()
+        thread.join()
+        with self._lock:
+            self._thread = None
+        log.info("Profiling stopped")
+
+    def toggle(self):
+        if self.running:
+            self.stop()
+        else:
+            self.start()
+
+    def _run(self):
+        me = threading.get_ident()
+        last_snapshot = time.perf_counter()
+        while not self._stop.wait(self.sample_interval):
+            self._sample(me)
+            now = time.perf_counter()
+            if now - last_snapshot >= self.snapshot_interval:
+                self._write_snapshot()
+                last_snapshot = now
+        self._write_snapshot()
+
+    def _sample(self, sampler_thread):
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == sampler_thread:
+                continue
+            stack = []
+            stage = None
+            while frame is not None:
+                code = frame.f_code
+                stack.append(code)
+                if stage is None:
+                    stage = _stage_codes.get(code)
+                frame = frame.f_back
+            self._samples[(stage or UNTAGGED, tuple(stack))] += 1
+
+    def _write_snapshot(self):
+        samples, self._samples = self._samples, collections.Counter()
+        if len(samples) == 0:
+            return
+
+        path = os.path.join(self.directory, "firesim-%s-%d-%03d.folded" %
+                            (time.strftime("%Y%m%d-%H%M%S"), os.getpid(),
+                             self.snapshots_written))
+
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            with open(path, "w") as f:
+                for (stage, stack), count in samples.items():
+                    names = [stage] + [_frame_name(c) for c in reversed(stack)]
+                    f.write("%s %d\n" % (";".join(names), count))
+        except OSError as e:
+            log.error("Could not write profile snapshot %s: %s" % (path, e))
+            return
+
+        self.snapshots_written += 1
+        totals = collections.Counter()
+        for (stage, _), count in samples.items():
+            totals[stage] += count
+        log.info("Wrote profile snapshot %s (%s)" % (path, ", ".join(
+            "%s %d" % (stage, count) for stage, count in sorted(totals.items()))))
+
+
+profiler = SamplingProfiler()
+
+
+def setup_profiling(args):
+    """
+    Configures the profiler from the command line (see lib/arguments.py),
+    lets SIGUSR1 toggle it where that signal exists, and starts it if
+    --profile was given.
+    """
+    profiler.directory = args.profile_dir
+    profiler.snapshot_interval = args.profile_interval
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: profiler.toggle())
+    if args.profile:
+        profiler.start()
@@ -0,0 +1,37 @@
+"""
+Builders for the FireMix datagrams that NetController.process_packet parses:
+
+    'B'                                  begin frame
+    'S' strand len_lo len_hi data...     RGB data for one strand
+    'E'                                  end frame
+
+len is the number of data bytes, little-endian.
+"""
+import struct
+
+import numpy as np
+
+BEGIN_FRAME = b'B'
+END_FRAME = b'E'
+
+STRAND_HEADER = struct.Struct("<cBH")
+
+
+def strand_packet(strand, data):
+    """
+    Returns an 'S' datagram carrying data (uint8 RGB, any shape) for strand
+    """
+    payload = np.asarray(data, dtype=np.uint8).tobytes()
+    return STRAND_HEADER.pack(b'S', strand, len(payload)) + payload
+
+
+def frame_packets(frame):
+    """
+    Returns the list of datagrams for one frame: 'B', one 'S' per strand of
+    frame (a dict of strand -> uint8 RGB data) in strand order, and 'E'.
+    """
+    packets = [BEGIN_FRAME]
+    for strand in sorted(frame):
+        packets.append(strand_packet(strand, frame[strand]))
+    packets.append(END_FRAME)
+    return packets
@@ -0,0 +1,87 @@
+import math
+
+from lib.geometry import hit_test_rect
+
+
+class SpatialGrid(object):
+    """
+    A uniform grid over axis-aligned rectangles, for quickly finding which
+    items might contain a point.
+
+    Each item is registered in every cell its (x, y, width, height) rect
+    overlaps.  A point query only looks at the items in one cell, so its cost
+    depends on how crowded that cell is rather than on the total number of
+    items.  Items can be moved or removed individually.
+    """
+
+    def __init__(self, cell_size=100):
+        self.cell_size = cell_size
+        self._cells = {}
+        self._item_cells = {}
+        self._item_rects = {}
+        self._item_order = {}
+        self._next_order = 0
+
+    def __len__(self):
+        return len(self._item_rects)
+
+    def __contains__(self, item):
+        return item in self._item_rects
+
+    def _cell(self, x, y):
+        return (int(math.floor(x / self.cell_size)),
+                int(math.floor(y / self.cell_size)))
+
+    def _cells_for_rect(self, rect):
+        x0, y0 = self._cell(rect[0], rect[1])
+        x1, y1 = self._cell(rect[0] + rect[2], rect[1] + rect[3])
+        return [(cx, cy) for cx in range(x0, x1 + 1)
+                for cy in range(y0, y1 + 1)]
+
+    def insert(self, item, rect):
+        """
+        Adds item with the bounding rect (x, y, width, height), or moves it
+        if it is already in the grid.
+        """
+        if item in self._item_rects:
+            self._unlink(item)
+        else:
+            self._item_order[item] = self._next_order
+            self._next_order += 1
+
+        cells = self._cells_for_rect(rect)
+        for cell in cells:
+            self._cells.setdefault(cell, []).append(item)
+        self._item_cells[item] = cells
+        self._item_rects[item] = rect
+
+    update = insert
+
+    def remove(self, item):
+        self._unlink(item)
+        self._item_rects.pop(item, None)
+        self._item_order.pop(item, None)
+
+    def _unlink(self, item):
+        for cell in self._item_cells.pop(item, []):
+            items = self._cells[cell]
+            items.remove(item)
+            if len(items) == 0:
+                del self._cells[cell]
+
+    def clear(self):
+        self._cells.clear()
+        self._item_cells.clear()
+        self._item_rects.clear()
+        self._item_order.clear()
+        self._next_order = 0
+
+    def query_point(self, pos):
+        """
+        Returns the items whose rect contains pos (or has it on the edge), in
+        the order they were first inserted.
+        """
+        items = self._cells.get(self._cell(pos[0], pos[1]), [])
+        hits = [item for item in items
+                if hit_test_rect(self._item_rects[item], pos)]
+        return sorted(hits, key=self._item_order.get)
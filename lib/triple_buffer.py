@@ -0,0 +1,68 @@
+from collections import deque
+
+
+class TripleBuffer(object):
+    """
+    Hands the most recent complete frame from a single producer thread (the
+    network receiver) to a single consumer thread (the GUI) without locking.
+
+    Three frames are in flight at any time: the back frame being assembled by
+    the producer, the middle frame that has been published but not yet picked
+    up, and the front frame the consumer is currently drawing.  Publishing
+    replaces the middle frame, so a slow consumer only ever sees the newest
+    data and the producer never waits.
+
+    The middle slot is a deque with maxlen=1, whose append() and popleft()
+    are atomic in CPython.  Each published frame carries a sequence number so
+    the consumer can count how many frames were overwritten before it got to
+    them.
+
+    publish() returns True when the consumer may be idle and should be woken
+    up, i.e. for the first frame published after each swap().  The wakeup
+    flag is raised before swap() looks at the middle slot, so a frame is never
+    published without either being picked up by that swap or waking the
+    consumer.
+    """
+
+    def __init__(self):
+        self._middle = deque(maxlen=1)
+        self._sequence = 0
+        self._last_swapped = 0
+        self.front = None
+        self._consumer_waiting = True
+        self.published = 0
+        self.swapped = 0
+        self.overwritten = 0
+
+    def publish(self, frame):
+        """
+        Publishes a complete frame.  Only call this from the producer thread.
+        The producer must not modify `frame` after publishing it.
+
+        Returns True if the consumer should be notified of the new frame.
+        """
+        self._sequence += 1
+        self.published = self._sequence
+        self._middle.append((self._sequence, frame))
+        if self._consumer_waiting:
+            self._consumer_waiting = False
+            return True
+        return False
+
+    def swap(self):
+        """
+        Makes the newest published frame the front frame and returns it, or
+        returns None if nothing new has been published since the last swap.
+        Only call this from the consumer thread.
+        """
+        self._consumer_waiting = True
+        try:
+            sequence, frame = self._middle.popleft()
+        except IndexError:
+            return None
+
+        self.overwritten += sequence - self._last_swapped - 1
+        self._last_swapped = sequence
+        self.swapped += 1
+        self.front = frame
+        return frame
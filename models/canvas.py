@@ -18,6 +18,17 @@ class Canvas(QObject):
 
         self._blurred = False
 
+        # Set when the whole canvas needs repainting (new pixel colors, a
+        # display setting changed, a new scene); cleared by the view after a
+        # full paint.  Changes to single pixel groups are tracked by the
+        # groups themselves (see PixelGroup.dirty).
+        self.dirty = True
+        self.changed.connect(self.mark_dirty)
+
+    @pyqtSlot()
+    def mark_dirty(self):
+        self.dirty = True
+
     @pyqtProperty(bool, notify=changed)
     def design_mode(self):
         return self._design_mode
@@ -45,3 +56,4 @@ class Canvas(QObject):
     @backdrop_enable.setter
     def backdrop_enable(self, s):
         self.scene.backdrop_enable = s
+        self.changed.emit()
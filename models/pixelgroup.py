@@ -10,10 +10,28 @@ from lib.geometry import (distance, distance_point_to_line, inflate_rect,
 
 __all__ = [
     "PixelGroup", "LinearPixelGroup", "RectangularPixelGroup",
-    "CircularPixelGroup"
+    "CircularPixelGroup", "linear_pixel_locations"
 ]
 
 
+def linear_pixel_locations(starts, ends, counts):
+    """
+    Returns a (sum(counts), 2) array of pixel locations for a set of linear
+    pixel groups, one group after another.  Each group's pixels are evenly
+    spaced from its start point towards its end point, with the first pixel
+    on the start point and the last pixel one step short of the end point.
+    """
+    starts = np.asarray(starts, dtype=float).reshape((-1, 2))
+    ends = np.asarray(ends, dtype=float).reshape((-1, 2))
+    counts = np.asarray(counts, dtype=int).reshape(-1)
+
+    group = np.repeat(np.arange(len(counts)), counts)
+    first = np.cumsum(counts) - counts
+    steps = (np.arange(counts.sum()) - first[group]) / counts[group]
+
+    return starts[group] + steps[:, np.newaxis] * (ends - starts)[group]
+
+
 class Handle:
     """
     Represents a graphical handle used for manipulating objects
@@ -77,16 +95,26 @@ class PixelGroup(QObject):
         self._strand = strand
         self._offset = offset
 
+        self.pixel_locations = np.zeros(count, dtype=pixel_location)
+        self.pixel_colors = np.zeros(count, dtype=pixel_color)
+
         # GUI-related
-        self.selected = False
+        self._selected = False
         self.draw_bb = False
-        self.hovering = False
+        self._hovering = False
         self.handles = []
         self.dragging = False
         self._drag_start_pos = None
         self._drag_delta = None
 
+        # Set when the group looks different from when the canvas last drew
+        # it; the canvas clears it after painting.
+        self.dirty = True
+        self.changed.connect(self.mark_dirty)
+
     changed = pyqtSignal()
+    # Emitted when dirty goes from False to True
+    repaint_needed = pyqtSignal()
 
     def __repr__(self):
         return "PixelGroup address (%d, %d)" % (self.strand, self.offset)
@@ -101,6 +129,7 @@ class PixelGroup(QObject):
             self._count = val
             self.pixel_locations = np.zeros(self._count, dtype=pixel_location)
             self.pixel_colors = np.zeros(self.count, dtype=pixel_color)
+            self._update_geometry()
 
     @pyqtProperty(int, notify=changed)
     def strand(self):
@@ -110,6 +139,7 @@ class PixelGroup(QObject):
     def strand(self, val):
         if self._strand != val and val > 0:
             self._strand = val
+            self.changed.emit()
 
     @pyqtProperty(int, notify=changed)
     def offset(self):
@@ -119,11 +149,50 @@ class PixelGroup(QObject):
     def offset(self, val):
         if self._offset != val and val > 0:
             self._offset = val
+            self.changed.emit()
 
     @property
     def drag_delta(self):
         return self._drag_delta
 
+    @property
+    def selected(self):
+        return self._selected
+
+    @selected.setter
+    def selected(self, val):
+        if self._selected != val:
+            self._selected = val
+            self.mark_dirty()
+
+    @property
+    def hovering(self):
+        return self._hovering
+
+    @hovering.setter
+    def hovering(self, val):
+        if self._hovering != val:
+            self._hovering = val
+            self.mark_dirty()
+
+    @pyqtSlot()
+    def mark_dirty(self):
+        """
+        Flags the group for repainting.  Geometry changes (changed) do this
+        automatically; call it directly for purely visual state.
+        """
+        if not self.dirty:
+            self.dirty = True
+            self.repaint_needed.emit()
+
+    def _update_geometry(self):
+        """
+        Recalculates pixel_locations after the shape of the group changes.
+        Subclasses should call this (or emit changed) so that the scene can
+        invalidate any pixel location caches.
+        """
+        self.changed.emit()
+
     def bounding_box(self):
         """
         Returns a bounding box that encompasses the pixels in the group
@@ -185,6 +254,8 @@ class LinearPixelGroup(PixelGroup):
                  strand=0, offset=0, json=None):
 
         super(LinearPixelGroup, self).__init__(count, strand, offset)
+        self.start_handle = None
+        self.end_handle = None
         if json is not None:
             self.from_json(json)
         else:
@@ -257,18 +328,20 @@ class LinearPixelGroup(PixelGroup):
 
     def _update_geometry(self):
         if self.count > 0:
-            ox = (self.end[0] - self.start[0]) / self.count
-            oy = (self.end[1] - self.start[1]) / self.count
-            px, py = self.start[0], self.start[1]
-            for i in range(self.count):
-                self.pixel_locations[i] = (px, py)
-                px += ox
-                py += oy
+            locations = linear_pixel_locations(self.start, self.end,
+                                               self.count)
+            self.pixel_locations['x'] = locations[:, 0]
+            self.pixel_locations['y'] = locations[:, 1]
         self._bounding_box = None
 
         # TODO: It would be nice if Handles updated automatically
-        self.start_handle.pos = self.start
-        self.end_handle.pos = self.end
+        # (Handles apply the drag delta themselves, so give them the
+        # undragged positions)
+        if self.start_handle is not None:
+            self.start_handle.pos = self._start
+            self.end_handle.pos = self._end
+
+        self.changed.emit()
 
     def bounding_box(self):
         if self._bounding_box is None:
@@ -301,44 +374,45 @@ class LinearPixelGroup(PixelGroup):
             self.dragging = True
             self._drag_start_pos = start_pos
             self._drag_delta = (0, 0)
+        self.mark_dirty()
 
     def on_drag_move(self, delta_pos):
         if self.start_handle.dragging:
             self.start = vec2_sum(self.start_handle.drag_start_pos, delta_pos)
-            self.start_handle.pos = self.start
         elif self.end_handle.dragging:
             self.end = vec2_sum(self.end_handle.drag_start_pos, delta_pos)
-            self.end_handle.pos = self.end
         else:
             self._drag_delta = delta_pos
+        self._update_geometry()
 
     def on_drag_end(self, delta_pos):
+        self.start_handle.dragging = False
+        self.start_handle.drag_start_pos = None
+        self.end_handle.dragging = False
+        self.end_handle.drag_start_pos = None
+
         if self.dragging:
             self.dragging = False
             self._drag_start_pos = None
             self._drag_delta = None
             self.move_by(delta_pos)
-
-        self.start_handle.dragging = False
-        self.start_handle.drag_start_pos = None
-        self.end_handle.dragging = False
-        self.end_handle.drag_start_pos = None
+        else:
+            self._update_geometry()
 
     def on_drag_cancel(self):
         if self.start_handle.dragging:
             self.start = self.start_handle.drag_start_pos
             self.start_handle.dragging = False
             self.start_handle.drag_start_pos = None
-            self.start_handle.pos = self.start
         elif self.end_handle.dragging:
             self.end = self.end_handle.drag_start_pos
             self.end_handle.dragging = False
             self.end_handle.drag_start_pos = None
-            self.end_handle.pos = self.end
         else:
             self.dragging = False
             self._drag_start_pos = None
             self._drag_delta = None
+        self._update_geometry()
 
 
 class RectangularPixelGroup(PixelGroup):
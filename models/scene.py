@@ -16,20 +16,59 @@
 # along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
 
 from builtins import range
+import functools
 import os
 import math
 import logging
 import numpy as np
 from scipy import spatial
 
-from PyQt5.QtCore import (pyqtProperty, pyqtSignal, pyqtSlot)
+from PyQt5.QtCore import (pyqtProperty, pyqtSignal, pyqtSlot, QObject)
 
 from lib.json_dict import JSONDict
 from lib.buffer_utils import BufferUtils
-from models.pixelgroup import LinearPixelGroup
+from lib.geometry_cache import GeometryCache, content_hash, sidecar_directory
+from lib.pixel_distances import PixelDistances
+from lib.spatial_grid import SpatialGrid
+from models.pixelgroup import LinearPixelGroup, linear_pixel_locations
 
 log = logging.getLogger("firemix.lib.scene")
 
+
+def cluster_centroids(points, threshold):
+    """
+    Groups an (N, 2) array of points and returns the centroid of each group
+    as a (groups, 2) array.  Points are taken in reverse index order; each
+    point not yet grouped starts a new group, together with every ungrouped
+    point closer than `threshold` to it.  Groups are not chained: a point
+    joins a group only if it is near that group's first point.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape((-1, 2))
+    if len(points) == 0:
+        return np.zeros((0, 2))
+
+    tree = spatial.cKDTree(points)
+    labels = np.full(len(points), -1, dtype=np.intp)
+    num_groups = 0
+    for index in range(len(points) - 1, -1, -1):
+        if labels[index] >= 0:
+            continue
+        hits = np.array(tree.query_ball_point(points[index], threshold),
+                        dtype=np.intp)
+        # query_ball_point includes points exactly `threshold` away
+        dx, dy = (points[hits] - points[index]).T
+        hits = hits[(np.hypot(dx, dy) < threshold) & (labels[hits] < 0)]
+        labels[hits] = num_groups
+        labels[index] = num_groups
+        num_groups += 1
+
+    sizes = np.bincount(labels, minlength=num_groups)
+    centroids = np.empty((num_groups, 2))
+    centroids[:, 0] = np.bincount(labels, points[:, 0], num_groups) / sizes
+    centroids[:, 1] = np.bincount(labels, points[:, 1], num_groups) / sizes
+    return centroids
+
+
 class Scene(JSONDict):
     """
     The scene file holds all the data related to pixel positioning and other
@@ -69,9 +108,18 @@ class Scene(JSONDict):
 
     """
 
+    # Largest amount of memory (bytes) pixel_distances may use at once
+    DISTANCE_MEMORY_BUDGET = 64 << 20
+
     changed = pyqtSignal()
+    # Re-emits PixelGroup.repaint_needed for every group in the scene
+    pixel_group_repaint_needed = pyqtSignal(QObject)
 
     def __init__(self, filepath=None):
+        self._pixel_locations_version = 0
+        self.distance_memory_budget = self.DISTANCE_MEMORY_BUDGET
+        # Whether warmup() keeps derived geometry in a cache next to the file
+        self.cache_geometry = True
         self._reset()
         super(Scene, self).__init__('scene', filepath, True)
 
@@ -79,17 +127,12 @@ class Scene(JSONDict):
         self._fixtures = None
         self._fixture_dict = {}
         self._fixture_hierarchy = None
-        self._colliding_fixtures_cache = {}
-        self._pixel_neighbors_cache = {}
-        self._pixel_locations_cache = {}
-        self._pixel_distance_cache = {}
-        self._intersection_points = None
         self._all_pixels = None
-        self._all_pixel_locations = None
         self._all_pixels_raw = None
         self._strand_settings = None
-        self._tree = None
         self._pixel_groups = []
+        self._pixel_group_index = None
+        self.invalidate_pixel_locations()
 
     def generate_new_data(self):
         self.data['file-type'] = "scene"
@@ -133,30 +176,16 @@ class Scene(JSONDict):
         Warms up caches
         """
         log.info("Warming up scene caches...")
-        fh = self.fixture_hierarchy()
-        for strand in fh:
-            for fixture in fh[strand]:
-                self.get_colliding_fixtures(strand, fixture)
-                for pixel in range(self.fixture(strand, fixture).pixels):
-                    index = BufferUtils.logical_to_index((strand, fixture, pixel))
-                    neighbors = self.get_pixel_neighbors(index)
-                    self.get_pixel_location(index)
-                    for neighbor in neighbors:
-                        self.get_pixel_distance(index, neighbor)
-        self.get_fixture_bounding_box()
+        locations = self._cached_geometry("pixel_locations",
+                                          self.get_packed_pixel_locations)
+        strand_map = self._cached_geometry("strand_pixel_map",
+                                           self._pack_strand_pixel_map)
+        self._packed_pixel_locations = locations
+        self._strand_pixel_map = self._unpack_strand_pixel_map(strand_map)
         self.get_intersection_points()
-        self.get_all_pixels_logical()
-        self._tree = spatial.KDTree(self.get_all_pixel_locations())
-
-        locations = self.get_all_pixel_locations()
-        self.pixelDistances = np.empty([len(locations), len(locations)])
-
-        for pixel in range(len(locations)):
-            cx, cy = locations[pixel]
-            x,y = (locations - (cx, cy)).T
-            pixel_distances = np.sqrt(np.square(x) + np.square(y))
-            self.pixelDistances[pixel] = pixel_distances
-
+        self.get_endpoint_collisions()
+        self.get_pixel_neighbor_graph()
+        # Pixel distances are computed on demand by self.pixel_distances
         log.info("Done")
 
     @property
@@ -217,6 +246,10 @@ class Scene(JSONDict):
     @pixel_groups.setter
     def pixel_groups(self, pixel_groups):
         self._pixel_groups = pixel_groups
+        for pg in pixel_groups:
+            self._connect_pixel_group(pg)
+        self._pixel_group_index = None
+        self.invalidate_pixel_locations()
         self.dirty = True
 
     @property
@@ -237,6 +270,191 @@ class Scene(JSONDict):
         self.data["backdrop-filename"] = path
         self.dirty = True
 
+    @pyqtSlot()
+    def invalidate_pixel_locations(self):
+        """
+        Drops the packed pixel location caches.  Called whenever a pixel group
+        is moved, resized or readdressed.
+        """
+        self._packed_pixel_locations = None
+        self._strand_pixel_map = None
+        self._pixel_distances = None
+        self._geometry_cache = None
+        self._intersection_points = {}
+        self._endpoint_tree = None
+        self._endpoint_collisions = {}
+        self._pixel_neighbor_graphs = {}
+        self._pixel_locations_version += 1
+
+    def get_pixel_groups_at(self, pos):
+        """
+        Returns the pixel groups whose bounding box contains pos (in scene
+        coordinates), in scene order.  Backed by a spatial index that is kept
+        up to date as groups move, so this does not scan every group.
+        """
+        if self._pixel_group_index is None:
+            self._pixel_group_index = SpatialGrid()
+            for pg in self.pixel_groups:
+                self._pixel_group_index.insert(pg, pg.bounding_box())
+        return self._pixel_group_index.query_point(pos)
+
+    def _connect_pixel_group(self, pg):
+        pg.changed.connect(self.invalidate_pixel_locations)
+        pg.changed.connect(functools.partial(self._on_pixel_group_changed, pg))
+        pg.repaint_needed.connect(
+            functools.partial(self.pixel_group_repaint_needed.emit, pg))
+
+    def _on_pixel_group_changed(self, pg):
+        # Only groups that are already indexed; this skips groups that have
+        # been replaced by a new pixel_groups list but are still connected.
+        if (self._pixel_group_index is not None and
+                pg in self._pixel_group_index):
+            self._pixel_group_index.update(pg, pg.bounding_box())
+
+    @property
+    def pixel_locations_version(self):
+        """
+        Incremented every time the packed pixel locations are invalidated, so
+        that consumers (e.g. the renderer) know when to rebuild derived data.
+        """
+        return self._pixel_locations_version
+
+    def get_packed_pixel_locations(self):
+        """
+        Returns a float32 (N, 2) array of the scene-space location of every
+        pixel in every pixel group, in pixel group order.  The array is cached
+        until invalidate_pixel_locations() is called; do not modify it.
+        """
+        if self._packed_pixel_locations is None:
+            self._build_packed_pixel_locations()
+        return self._packed_pixel_locations
+
+    @property
+    def pixel_distances(self):
+        """
+        A PixelDistances over get_packed_pixel_locations(), rebuilt after the
+        pixel locations are invalidated.  Distances are computed on demand,
+        using at most distance_memory_budget bytes at a time.
+        """
+        if self._pixel_distances is None:
+            self._pixel_distances = PixelDistances(
+                self.get_packed_pixel_locations(),
+                memory_budget=self.distance_memory_budget)
+        return self._pixel_distances
+
+    def _cached_geometry(self, name, build):
+        """
+        Returns the array `name` derived from the current pixel groups, from
+        the on-disk geometry cache if it is there, otherwise from build()
+        (and saves it).  Cached arrays are memory-mapped read-only.
+        """
+        if not self.cache_geometry or not self.filepath:
+            return build()
+
+        directory = sidecar_directory(self.filepath)
+        if (self._geometry_cache is None or
+                self._geometry_cache.directory != directory):
+            key = content_hash([pg.to_json() for pg in self.pixel_groups])
+            self._geometry_cache = GeometryCache(directory, key)
+        return self._geometry_cache.get(name, build)
+
+    def get_strand_pixel_map(self):
+        """
+        Returns a dict mapping each strand to a (src, dst) pair of index
+        arrays: pixel src[i] of the strand's color data is drawn at row dst[i]
+        of get_packed_pixel_locations().  Both arrays are sorted by src, so if
+        only the first n pixels of a strand have data, the pixels to draw are
+        src[:k], dst[:k] where k = np.searchsorted(src, n).
+        """
+        if self._strand_pixel_map is None:
+            self._build_packed_pixel_locations()
+        return self._strand_pixel_map
+
+    def _pack_strand_pixel_map(self):
+        """
+        Returns get_strand_pixel_map() as one (M, 3) int64 array of
+        (strand, src, dst) rows sorted by strand, then src
+        """
+        strand_map = self.get_strand_pixel_map()
+        rows = [np.zeros((0, 3), dtype=np.int64)]
+        for strand in sorted(strand_map):
+            src, dst = strand_map[strand]
+            rows.append(np.stack((np.full(len(src), strand), src, dst), axis=1))
+        return np.concatenate(rows).astype(np.int64)
+
+    def _unpack_strand_pixel_map(self, packed):
+        starts = np.flatnonzero(np.diff(packed[:, 0])) + 1
+        bounds = zip(np.concatenate(([0], starts)),
+                     np.concatenate((starts, [len(packed)])))
+        return dict((int(packed[start, 0]),
+                     (packed[start:end, 1], packed[start:end, 2]))
+                    for start, end in bounds if end > start)
+
+    def get_strand_lengths(self):
+        """
+        Returns a dict of strand -> number of pixels addressed on that strand
+        (the highest offset + count of its pixel groups).
+        """
+        return dict((strand, int(src[-1]) + 1)
+                    for strand, (src, dst) in self.get_strand_pixel_map().items())
+
+    def gather_pixel_colors(self, color_data, out=None):
+        """
+        Packs per-strand color data (a dict of strand -> uint8 RGB array, as
+        held in Canvas.color_data) into an (N, 4) RGBA uint8 array in the
+        same order as get_packed_pixel_locations().  Pixels whose strand has
+        no data (or too little) get zero alpha.
+
+        If `out` has the right shape it is filled in place and returned.
+        """
+        num_pixels = len(self.get_packed_pixel_locations())
+        if out is None or out.shape != (num_pixels, 4):
+            out = np.zeros((num_pixels, 4), dtype=np.uint8)
+
+        for strand, (src, dst) in self.get_strand_pixel_map().items():
+            data = color_data.get(strand, None)
+            n = 0
+            if data is not None:
+                data = np.asarray(data, dtype=np.uint8).reshape((-1, 3))
+                n = np.searchsorted(src, len(data))
+                out[dst[:n], :3] = data[src[:n]]
+                out[dst[:n], 3] = 255
+            out[dst[n:], 3] = 0
+
+        return out
+
+    def _build_packed_pixel_locations(self):
+        groups = [pg for pg in self.pixel_groups if pg.count > 0]
+
+        if len(groups) == 0:
+            self._packed_pixel_locations = np.zeros((0, 2), dtype=np.float32)
+            self._strand_pixel_map = {}
+            return
+
+        # All groups are linear for now, so generate every location in one
+        # pass rather than gathering each group's pixel_locations.
+        locations = linear_pixel_locations([pg.start for pg in groups],
+                                           [pg.end for pg in groups],
+                                           [pg.count for pg in groups])
+        self._packed_pixel_locations = locations.astype(np.float32)
+
+        strand_src = {}
+        strand_dst = {}
+        base = 0
+        for pg in groups:
+            strand_src.setdefault(pg.strand, []).append(
+                np.arange(pg.offset, pg.offset + pg.count))
+            strand_dst.setdefault(pg.strand, []).append(
+                np.arange(base, base + pg.count))
+            base += pg.count
+
+        self._strand_pixel_map = {}
+        for strand in strand_src:
+            src = np.concatenate(strand_src[strand])
+            dst = np.concatenate(strand_dst[strand])
+            order = np.argsort(src, kind='stable')
+            self._strand_pixel_map[strand] = (src[order], dst[order])
+
     def get_matrix_extents(self):
         """
         Returns a tuple of (strands, pixels) indicating the maximum extents needed
@@ -252,103 +470,139 @@ class Scene(JSONDict):
 
         return (strands, longest_strand)
 
-    def get_colliding_fixtures(self, strand, address, loc='start', radius=50):
+    def get_colliding_pixel_groups(self, index, loc='start', radius=50):
         """
-        Returns a list of (strand, fixture, pixel) tuples containing the addresses of any fixtures that collide with the
-        input fixture.  Pixel is set to the closest pixel to the target location (generally either the first or last
-        pixel).  The collision bound is a circle given by the radius input, centered on the specified fixture endpoint.
+        Returns a list of (pixel group, pixel) tuples for the pixel groups that collide with
+        pixel group number `index`.  Pixel is set to the closest pixel to the target location (either the first or last
+        pixel).  The collision bound is a circle given by the radius input, centered on the specified group endpoint.
+        The group itself is included.
 
-        Location to collide: 'start' == pos1, 'end' == pos2, 'midpoint' == midpoint
+        Location to collide: 'start', 'end', or 'midpoint'
         """
-        f = self.fixture(strand, address)
-
-        if loc == 'start':
-            center = f.pos1
-        elif loc == 'end':
-            center = f.pos2
-        elif loc == 'midpoint':
-            center = f.midpoint()
+        if loc == 'midpoint':
+            center = self.get_pixel_group_endpoints()[2 * index:2 * index + 2].mean(axis=0)
+            hits = np.array(self._get_endpoint_tree().query_ball_point(center, radius),
+                            dtype=np.intp)
+            rows = self._resolve_collisions(np.zeros(len(hits), dtype=np.intp), hits)
+        elif loc in ('start', 'end'):
+            collisions = self.get_endpoint_collisions(radius)
+            endpoint = 2 * index + (loc == 'end')
+            first, last = np.searchsorted(collisions[:, 0], (endpoint, endpoint + 1))
+            rows = collisions[first:last]
         else:
             raise ValueError("loc must be one of 'start', 'end', 'midpoint'")
 
-        colliding = self._colliding_fixtures_cache.get((strand, address, loc), None)
+        return [(self.pixel_groups[group], int(pixel)) for _, group, pixel in rows]
 
-        if colliding is None:
-            colliding = []
-            r2 = pow(radius, 2)
-            x1, y1 = center
-            for tf in self.fixtures():
-                # Match start point
-                x2, y2 = tf.pos1
-                if pow(x2 - x1, 2) + pow(y2 - y1, 2) <= r2:
-                    #print tf, "collides with", strand, address
-                    colliding.append((tf.strand, tf.address, 0))
-                    continue
-                    # Match end point
-                x2, y2 = tf.pos2
-                if pow(x2 - x1, 2) + pow(y2 - y1, 2) <= r2:
-                    #print tf, "collides with", strand, address, "backwards"
-                    colliding.append((tf.strand, tf.address, tf.pixels - 1))
+    def get_endpoint_collisions(self, radius=50):
+        """
+        Returns the collisions of every pixel group endpoint with every other
+        pixel group, computed in one pass over the endpoint KD-tree, as an
+        (M, 3) int64 array of (endpoint, group, pixel) rows sorted by
+        endpoint and group.  Endpoints are numbered as in
+        get_pixel_group_endpoints(), and pixel is the colliding group's
+        first or last pixel (see get_colliding_pixel_groups).
+        """
+        collisions = self._endpoint_collisions.get(radius, None)
+
+        if collisions is None:
+            collisions = self._cached_geometry(
+                "endpoint_collisions_%g" % radius,
+                lambda: self._build_endpoint_collisions(radius))
+            self._endpoint_collisions[radius] = collisions
+
+        return collisions
+
+    def _get_endpoint_tree(self):
+        if self._endpoint_tree is None:
+            self._endpoint_tree = spatial.cKDTree(self.get_pixel_group_endpoints())
+        return self._endpoint_tree
+
+    def _build_endpoint_collisions(self, radius):
+        tree = self._get_endpoint_tree()
+        pairs = tree.query_pairs(radius, output_type="ndarray")
+        everything = np.arange(tree.n)
+        queries = np.concatenate((pairs[:, 0], pairs[:, 1], everything))
+        hits = np.concatenate((pairs[:, 1], pairs[:, 0], everything))
+        return self._resolve_collisions(queries, hits)
+
+    def _resolve_collisions(self, queries, hits):
+        """
+        Turns (query, endpoint hit) pairs into sorted, unique (query, group,
+        pixel) rows.  A group hit at both ends collides at its start.
+        """
+        groups = hits // 2
+        at_end = hits % 2
+        order = np.lexsort((at_end, groups, queries))
+        queries, groups, at_end = queries[order], groups[order], at_end[order]
 
-            self._colliding_fixtures_cache[(strand, address, loc)] = colliding
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = (queries[1:] != queries[:-1]) | (groups[1:] != groups[:-1])
+        queries, groups, at_end = queries[first], groups[first], at_end[first]
 
-        return colliding
+        counts = np.array([pg.count for pg in self.pixel_groups], dtype=np.int64)
+        pixels = np.where(at_end == 1, counts[groups] - 1, 0)
+        return np.stack((queries, groups, pixels), axis=1).astype(np.int64)
 
-    def get_pixel_neighbors(self, index):
+    def get_pixel_neighbors(self, index, radius=3):
         """
-        Returns a list of pixel addresses that are adjacent to the given address.
+        Returns a read-only array of the indices of the pixels within radius
+        of the given pixel (including itself), in ascending order.
         """
+        indptr, indices = self.get_pixel_neighbor_graph(radius)
+        return indices[indptr[index]:indptr[index + 1]]
 
-        neighbors = self._pixel_neighbors_cache.get(index, None)
-
-        if neighbors is None:
-            neighbors = []
-            if self._tree:
-                neighbors = self._tree.query_ball_point(self.get_pixel_location(index), 3)
-                # if len(neighbors) > 4:
-                #     print index, neighbors
-                self._pixel_neighbors_cache[index] = neighbors
-
-        return neighbors
+    def get_pixel_neighbor_graph(self, radius=3):
+        """
+        Returns the neighbors of every pixel as CSR (indptr, indices) arrays:
+        the neighbors of pixel i are indices[indptr[i]:indptr[i + 1]].
+        Pixels are indexed in get_packed_pixel_locations() order.
+        """
+        graph = self._pixel_neighbor_graphs.get(radius, None)
+
+        if graph is None:
+            built = []
+
+            def build(part):
+                if not built:
+                    built.extend(self._build_pixel_neighbor_graph(radius))
+                return built[part]
+
+            graph = tuple(self._cached_geometry(
+                "pixel_neighbors_%g_%s" % (radius, name),
+                functools.partial(build, part))
+                for part, name in enumerate(("indptr", "indices")))
+            self._pixel_neighbor_graphs[radius] = graph
+
+        return graph
+
+    def _build_pixel_neighbor_graph(self, radius):
+        locations = self.get_packed_pixel_locations()
+        pairs = spatial.cKDTree(locations).query_pairs(radius, output_type="ndarray")
+        everything = np.arange(len(locations))
+        rows = np.concatenate((pairs[:, 0], pairs[:, 1], everything))
+        columns = np.concatenate((pairs[:, 1], pairs[:, 0], everything))
+        order = np.lexsort((columns, rows))
+
+        indptr = np.zeros(len(locations) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(locations)), out=indptr[1:])
+        indices = columns[order].astype(np.int32)
+        indptr.flags.writeable = indices.flags.writeable = False
+        return indptr, indices
 
     def get_pixel_location(self, index):
         """
-        Returns a given pixel's location in scene coordinates.
+        Returns a given pixel's location in scene coordinates.  Pixels are
+        indexed in the order of get_packed_pixel_locations().
         """
-        loc = self._pixel_locations_cache.get(index, None)
-
-        if loc is None:
-
-            strand, address, pixel = BufferUtils.index_to_logical(index)
-            f = self.fixture(strand, address)
-
-            if pixel == 0:
-                loc = f.pos1
-            elif pixel == (f.pixels - 1):
-                loc = f.pos2
-            else:
-                x1, y1 = f.pos1
-                x2, y2 = f.pos2
-                scale = old_div(float(pixel), f.pixels)
-                relx, rely = ((x2 - x1) * scale, (y2 - y1) * scale)
-                loc = (x1 + relx, y1 + rely)
-
-            self._pixel_locations_cache[index] = loc
-
-        return loc
+        x, y = self.get_packed_pixel_locations()[index]
+        return float(x), float(y)
 
     def get_pixel_distance(self, first, second):
         """
         Calculates the distance (in scene coordinate units) between two pixels
         """
-        dist = self._pixel_distance_cache.get((first, second), None)
-        if dist is None:
-            first_loc = self.get_pixel_location(first)
-            second_loc = self.get_pixel_location(second)
-            dist = self.get_point_distance(first_loc, second_loc)
-            self._pixel_distance_cache[(first, second)] = dist
-            self._pixel_distance_cache[(second, first)] = dist
-        return dist
+        return self.pixel_distances.distance(first, second)
 
     def get_point_distance(self, first, second):
         return math.fabs(math.sqrt(math.pow(second[0] - first[0], 2) + math.pow(second[1] - first[1], 2)))
@@ -366,7 +620,11 @@ class Scene(JSONDict):
         return self._all_pixels
 
     def get_pixel_distances(self, pixel):
-        return self.pixelDistances[pixel]
+        """
+        Returns a read-only float32 array of the distances from the given
+        pixel to every pixel, in get_packed_pixel_locations() order
+        """
+        return self.pixel_distances.row(pixel)
 
     def get_all_pixels(self):
         """
@@ -386,84 +644,50 @@ class Scene(JSONDict):
         """
         Returns a numpy array of (x, y) pairs.
         """
-        if self._all_pixel_locations is None:
-            pixels = self.get_all_pixels()
-            pixel_location_list = []
-            for pixel in pixels:
-                pixel_location_list.append(self.get_pixel_location(pixel))
-
-            self._all_pixel_locations = np.asarray(pixel_location_list)
-        return np.copy(self._all_pixel_locations)
-
+        return self.get_packed_pixel_locations().astype(np.float64)
 
     def get_fixture_bounding_box(self):
         """
-        Returns the bounding box containing all fixtures in the scene
+        Returns the bounding box containing all pixels in the scene
         Return value is a tuple of (xmin, ymin, xmax, ymax)
         """
-        xmin = 999999
-        xmax = -999999
-        ymin = 999999
-        ymax = -999999
-
-        fh = self.fixture_hierarchy()
-        for strand in fh:
-            for fixture in fh[strand]:
-                for pixel in range(self.fixture(strand, fixture).pixels):
-                    x, y = self.get_pixel_location(BufferUtils.logical_to_index((strand, fixture, pixel)))
-                    if x < xmin:
-                        xmin = x
-                    if x > xmax:
-                        xmax = x
-                    if y < ymin:
-                        ymin = y
-                    if y > ymax:
-                        ymax = y
-
+        locations = self.get_packed_pixel_locations()
+        if len(locations) == 0:
+            return (0.0, 0.0, 0.0, 0.0)
+        xmin, ymin = locations.min(axis=0).tolist()
+        xmax, ymax = locations.max(axis=0).tolist()
         return (xmin, ymin, xmax, ymax)
 
+    def get_pixel_group_endpoints(self):
+        """
+        Returns a float64 (2 * groups, 2) array of the start and end of every
+        pixel group: row 2i is the start of group i, row 2i + 1 its end
+        """
+        endpoints = np.empty((len(self.pixel_groups), 2, 2))
+        for i, pg in enumerate(self.pixel_groups):
+            endpoints[i] = (pg.start, pg.end)
+        return endpoints.reshape((-1, 2))
+
     def get_intersection_points(self, threshold=50):
         """
         Returns a list of points in scene coordinates that represent the average location of
-        each intersection of two or more fixture endpoints.
+        each intersection of two or more pixel group endpoints.
 
-        For each fixture endpoint, all other endpoints are compared to see if they fall within a certain distance
-        of the given endpoint.  This loop generates a list of groups.  Then, the average location of each
-        group is calculated and returned.
+        For each endpoint, the endpoints closer than the threshold that are
+        not already in a group join its group (see cluster_centroids).  Then
+        the average location of each group is returned.
         """
-        if self._intersection_points is None:
+        points = self._intersection_points.get(threshold, None)
 
-            endpoints = []
-            for f in self.fixtures():
-                endpoints.append(f.pos1)
-                endpoints.append(f.pos2)
-
-            groups = []
-            while len(endpoints) > 0:
-                endpoint = endpoints.pop()
-                group = [endpoint]
-                to_remove = []
-                for other in endpoints:
-                    dx, dy = (other[0] - endpoint[0], other[1] - endpoint[1])
-                    dist = math.fabs(math.sqrt(math.pow(dx, 2) + math.pow(dy, 2)))
-                    if (dist < threshold):
-                        group.append(other)
-                        to_remove.append(other)
-                endpoints = [e for e in endpoints if e not in to_remove]
-                groups.append(group)
-
-            centroids = []
-            for group in groups:
-                num_points = len(group)
-                tx = 0
-                ty = 0
-                for point in group:
-                    tx += point[0]
-                    ty += point[1]
-                centroids.append((old_div(tx, num_points), old_div(ty, num_points)))
-            self._intersection_points = centroids
-
-        return self._intersection_points
+        if points is None:
+            centroids = self._cached_geometry(
+                "intersection_points_%g" % threshold,
+                lambda: cluster_centroids(self.get_pixel_group_endpoints(),
+                                          threshold))
+            points = [tuple(p) for p in centroids.tolist()]
+            self._intersection_points[threshold] = points
+
+        return points
 
     def _migrate_v1_to_v2(self):
 
@@ -526,6 +750,7 @@ class Scene(JSONDict):
         for pg_data in self["pixel-groups"]:
             if pg_data["type"] == "linear":
                 pg = LinearPixelGroup(json=pg_data)
+                self._connect_pixel_group(pg)
                 self._pixel_groups.append(pg)
             else:
                 raise NotImplementedError("Unsupported pixel group type!")
@@ -0,0 +1,170 @@
+"""
+Benchmarks Scene.get_intersection_points on a synthetic scene of pixel
+groups joined end to end on a jittered grid:
+
+    python test/bench_intersections.py --groups 50000
+
+The original pairwise implementation is quadratic, so it only runs on the
+first --legacy-groups groups.  Its centroids are checked against
+cluster_centroids on that subset, on a chain of endpoints closer than the
+threshold to their neighbors but not to each other, and on every scene in
+data/scenes.
+"""
+from __future__ import print_function
+import argparse
+import glob
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+from models.pixelgroup import LinearPixelGroup
+from models.scene import Scene, cluster_centroids
+from bench_util import load_scene
+
+
+def synthetic_endpoints(groups, spacing=200.0, jitter=5.0, seed=0):
+    """
+    Returns a (groups, 2, 2) array of (start, end) pairs.  Each group joins
+    two neighboring points of a square grid, and every endpoint is moved
+    by up to `jitter` so that the endpoints meeting at a joint are close
+    but not equal.
+    """
+    rng = np.random.RandomState(seed)
+    side = int(math.ceil(math.sqrt(groups / 2.0))) + 1
+    joints = np.stack(np.meshgrid(np.arange(side), np.arange(side)),
+                      axis=-1).reshape((-1, 2)) * spacing
+
+    index = np.arange(side * side).reshape((side, side))
+    horizontal = np.stack((index[:, :-1].ravel(), index[:, 1:].ravel()), axis=1)
+    vertical = np.stack((index[:-1, :].ravel(), index[1:, :].ravel()), axis=1)
+    edges = np.concatenate((horizontal, vertical))[:groups]
+
+    endpoints = joints[edges].astype(np.float64)
+    endpoints += rng.uniform(-jitter, jitter, endpoints.shape)
+    return endpoints
+
+
+def synthetic_scene(endpoints, pixels=10):
+    scene = Scene(None)
+    scene.pixel_groups = [
+        LinearPixelGroup(start=tuple(start), end=tuple(end), count=pixels,
+                         strand=i // 100, offset=(i % 100) * pixels)
+        for i, (start, end) in enumerate(endpoints.tolist())]
+    return scene
+
+
+def chained_endpoints(threshold, length=20):
+    """
+    Returns endpoints spaced 0.8 * threshold apart along a line, so that
+    each is near its neighbors but not its neighbors' neighbors
+    """
+    x = np.arange(length) * 0.8 * threshold
+    return np.stack((x, np.zeros(length)), axis=1)
+
+
+def same_centroids(name, endpoints, threshold, actual=None):
+    expected = legacy_intersection_points(endpoints, threshold)
+    if actual is None:
+        actual = cluster_centroids(endpoints.reshape((-1, 2)), threshold)
+    match = len(actual) == len(expected) and np.allclose(actual, expected)
+    print("%-24s threshold %-4g %4d intersections, %s" %
+          (name, threshold, len(expected), "match" if match else
+           "DIFFER (got %d)" % len(actual)))
+    return match
+
+
+def legacy_intersection_points(endpoints, threshold=50):
+    """
+    The original Scene.get_intersection_points
+    """
+    endpoints = [tuple(e) for e in endpoints.reshape((-1, 2)).tolist()]
+    groups = []
+    while len(endpoints) > 0:
+        endpoint = endpoints.pop()
+        group = [endpoint]
+        to_remove = []
+        for other in endpoints:
+            dx, dy = (other[0] - endpoint[0], other[1] - endpoint[1])
+            dist = math.fabs(math.sqrt(math.pow(dx, 2) + math.pow(dy, 2)))
+            if (dist < threshold):
+                group.append(other)
+                to_remove.append(other)
+        endpoints = [e for e in endpoints if e not in to_remove]
+        groups.append(group)
+
+    centroids = []
+    for group in groups:
+        num_points = len(group)
+        tx = 0
+        ty = 0
+        for point in group:
+            tx += point[0]
+            ty += point[1]
+        centroids.append((tx / num_points, ty / num_points))
+    return centroids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Intersection point benchmark")
+    parser.add_argument("--groups", type=int, default=50000)
+    parser.add_argument("--legacy-groups", type=int, default=2000,
+                        help="Groups to run the quadratic version on (0 to skip)")
+    parser.add_argument("--threshold", type=float, default=50)
+    args = parser.parse_args()
+
+    match = True
+    for threshold in (args.threshold, 2 * args.threshold):
+        match &= same_centroids("chain", chained_endpoints(threshold),
+                                threshold)
+        for path in sorted(glob.glob(os.path.join(
+                os.path.dirname(os.path.abspath(__file__)), "..", "data",
+                "scenes", "*.json"))):
+            scene = load_scene(path)
+            match &= same_centroids(os.path.basename(path),
+                                    scene.get_pixel_group_endpoints(),
+                                    threshold,
+                                    scene.get_intersection_points(threshold))
+
+    endpoints = synthetic_endpoints(args.groups)
+
+    start = time.perf_counter()
+    scene = synthetic_scene(endpoints)
+    print("%d pixel groups created in %.2fs" %
+          (len(scene.pixel_groups), time.perf_counter() - start))
+
+    start = time.perf_counter()
+    points = scene.get_intersection_points(args.threshold)
+    elapsed = time.perf_counter() - start
+    print("get_intersection_points: %d intersections in %.1fms" %
+          (len(points), elapsed * 1000))
+
+    if args.legacy_groups > 0:
+        subset = endpoints[:args.legacy_groups]
+
+        start = time.perf_counter()
+        expected = legacy_intersection_points(subset, args.threshold)
+        legacy_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        actual = cluster_centroids(subset.reshape((-1, 2)), args.threshold)
+        elapsed = time.perf_counter() - start
+
+        subset_match = (len(actual) == len(expected) and
+                        np.allclose(actual, expected))
+        match &= subset_match
+        print("%d groups: legacy %.1fms, cluster_centroids %.1fms (%.0fx), "
+              "centroids %s" % (len(subset), legacy_elapsed * 1000,
+                                elapsed * 1000, legacy_elapsed / elapsed,
+                                "match" if subset_match else "DIFFER"))
+
+    if not match:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
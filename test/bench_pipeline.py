@@ -0,0 +1,231 @@
+"""
+Benchmarks the network-to-pixel pipeline without sockets or a display.
+
+Synthesized 'B'/'S'/'E' packet streams are fed straight into
+NetController.process_packet.  Each completed frame goes through
+CanvasController.on_new_frame, then Scene.gather_pixel_colors (the color
+packing the GL renderer does every paint), and optionally the NumPy
+Rasterizer.  Every stage is timed per frame.  A second pass under
+tracemalloc measures allocations.
+
+Strand layout comes either from a scene file:
+
+    python test/bench_pipeline.py --scene data/scenes/lotus.json
+
+or from a synthetic grid of strands:
+
+    python test/bench_pipeline.py --strands 64 --pixels 300 --output bench.json
+
+Scene files are copied to a temporary directory before loading, because
+loading a v1 scene migrates and re-saves it.
+"""
+from __future__ import print_function
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+from PyQt5 import QtCore
+
+from controllers.canvascontroller import CanvasController
+from controllers.netcontroller import NetController
+from lib.protocol import frame_packets
+from lib.rasterizer import Rasterizer
+from models.pixelgroup import LinearPixelGroup
+from models.scene import Scene
+from bench_util import load_scene
+
+STAGES = ("parse", "handoff", "gather", "rasterize")
+
+
+def synthetic_scene(strands, pixels):
+    scene = Scene(None)
+    groups = []
+    for strand in range(strands):
+        y = 10 + strand * 10
+        groups.append(LinearPixelGroup(start=(10, y), end=(10 + pixels, y),
+                                       count=pixels, strand=strand, offset=0))
+    scene.pixel_groups = groups
+    scene.extents = (pixels + 20, strands * 10 + 20)
+    return scene
+
+
+def make_frames(strand_lengths, count, seed=0):
+    """
+    Returns `count` distinct frames worth of packets, to be cycled through
+    """
+    rng = np.random.RandomState(seed)
+    frames = []
+    for _ in range(count):
+        frame = dict((strand, rng.randint(0, 256, 3 * length).astype(np.uint8))
+                     for strand, length in strand_lengths.items())
+        frames.append(frame_packets(frame))
+    return frames
+
+
+class Pipeline(object):
+
+    def __init__(self, scene, rasterize):
+        self.scene = scene
+        self.net = NetController(None, port=0)
+        self.controller = CanvasController(None)
+        self.controller.model.scene = scene
+        self.rasterizer = Rasterizer(scene) if rasterize else None
+        self.colors = None
+        self.net.new_frame.connect(self.on_frame)
+        self.timings = None
+
+    def on_frame(self, frame):
+        t0 = time.perf_counter()
+        self.controller.on_new_frame(frame)
+        t1 = time.perf_counter()
+        self.colors = self.scene.gather_pixel_colors(
+            self.controller.model.color_data, self.colors)
+        t2 = time.perf_counter()
+        if self.rasterizer is not None:
+            self.rasterizer.render(self.controller.model.color_data)
+        t3 = time.perf_counter()
+        if self.timings is not None:
+            self.timings["handoff"].append(t1 - t0)
+            self.timings["gather"].append(t2 - t1)
+            self.timings["rasterize"].append(t3 - t2)
+
+    def run(self, frames, num_frames, timed=True):
+        """
+        Pushes num_frames frames through the pipeline.  Returns the elapsed
+        time and number of packets processed.
+        """
+        self.timings = dict((stage, []) for stage in STAGES) if timed else None
+        process = self.net.process_packet
+        packets_processed = 0
+
+        start = time.perf_counter()
+        for i in range(num_frames):
+            packets = frames[i % len(frames)]
+            t0 = time.perf_counter()
+            # Everything up to 'E' is parsing; 'E' triggers the other stages
+            for packet in packets[:-1]:
+                process(packet)
+            t1 = time.perf_counter()
+            process(packets[-1])
+            if timed:
+                self.timings["parse"].append(t1 - t0)
+            packets_processed += len(packets)
+        return time.perf_counter() - start, packets_processed
+
+
+def percentiles(samples):
+    us = np.asarray(samples) * 1e6
+    if len(us) == 0:
+        return {}
+    return {
+        "mean_us": float(us.mean()),
+        "p50_us": float(np.percentile(us, 50)),
+        "p95_us": float(np.percentile(us, 95)),
+        "p99_us": float(np.percentile(us, 99)),
+        "max_us": float(us.max()),
+    }
+
+
+def git_revision():
+    try:
+        out = subprocess.check_output(["git", "rev-parse", "HEAD"],
+                                      cwd=os.path.dirname(os.path.abspath(__file__)),
+                                      stderr=subprocess.STDOUT)
+        return out.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FireSim pipeline benchmark")
+    parser.add_argument("--scene", type=str,
+                        help="Scene file to take the strand layout from")
+    parser.add_argument("--strands", type=int, default=32,
+                        help="Number of strands (without --scene)")
+    parser.add_argument("--pixels", type=int, default=300,
+                        help="Pixels per strand (without --scene)")
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--alloc-frames", type=int, default=200,
+                        help="Frames to run under tracemalloc (0 to skip)")
+    parser.add_argument("--rasterize", action="store_true",
+                        help="Include the NumPy rasterizer stage")
+    parser.add_argument("--output", type=str,
+                        help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    app = QtCore.QCoreApplication(["bench_pipeline"])
+
+    if args.scene is not None:
+        scene = load_scene(args.scene)
+    else:
+        scene = synthetic_scene(args.strands, args.pixels)
+
+    strand_lengths = scene.get_strand_lengths()
+    frames = make_frames(strand_lengths, 16)
+    pipeline = Pipeline(scene, args.rasterize)
+
+    pipeline.run(frames, args.warmup, timed=False)
+    elapsed, packets = pipeline.run(frames, args.frames)
+
+    results = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "config": {
+            "scene": args.scene,
+            "strands": len(strand_lengths),
+            "pixels": int(sum(strand_lengths.values())),
+            "frames": args.frames,
+            "packets_per_frame": len(frames[0]),
+            "rasterize": args.rasterize,
+        },
+        "packets_per_sec": packets / elapsed,
+        "frames_per_sec": args.frames / elapsed,
+        "stages": dict((stage, percentiles(samples))
+                       for stage, samples in pipeline.timings.items()
+                       if args.rasterize or stage != "rasterize"),
+    }
+
+    if args.alloc_frames > 0:
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        pipeline.run(frames, args.alloc_frames, timed=False)
+        after, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results["allocations"] = {
+            "frames": args.alloc_frames,
+            "peak_bytes": peak - before,
+            "retained_bytes": after - before,
+        }
+
+    print("%d strands, %d pixels, %d packets/frame" %
+          (results["config"]["strands"], results["config"]["pixels"],
+           results["config"]["packets_per_frame"]))
+    print("%10.0f packets/sec %10.1f frames/sec" %
+          (results["packets_per_sec"], results["frames_per_sec"]))
+    for stage, stats in sorted(results["stages"].items()):
+        print("%-10s p50 %8.1fus  p95 %8.1fus  p99 %8.1fus" %
+              (stage, stats["p50_us"], stats["p95_us"], stats["p99_us"]))
+    if "allocations" in results:
+        print("allocations: peak %d bytes, retained %d bytes over %d frames" %
+              (results["allocations"]["peak_bytes"],
+               results["allocations"]["retained_bytes"],
+               results["allocations"]["frames"]))
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Compares packets/sec for the NetController receive backends.
+
+A sender thread blasts FireMix-style frames ('B', one 'S' per strand, 'E')
+at a NetController over loopback, and the receiver runs until the traffic
+stops.  Packets the kernel dropped because the receiver fell behind are not
+counted, so the result is the rate each backend can actually sustain.
+
+Run from the repository root:
+
+    python test/bench_receive.py --frames 2000 --strands 64 --pixels 160
+"""
+from __future__ import print_function
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+from PyQt5 import QtCore
+
+from controllers.netcontroller import NetController, BACKENDS
+from lib.protocol import frame_packets
+
+
+def make_frame(strands, pixels):
+    data = (np.arange(3 * pixels) % 256).astype(np.uint8)
+    return frame_packets(dict((strand, data) for strand in range(strands)))
+
+
+def send_frames(port, frames, packets):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    for _ in range(frames):
+        for packet in packets:
+            sock.sendto(packet, ("127.0.0.1", port))
+    sock.close()
+
+
+def run_backend(app, backend, port, frames, packets):
+    controller = NetController(None, backend=backend, port=port)
+    sender = threading.Thread(target=send_frames,
+                              args=(port, frames, packets))
+
+    state = {"last_count": -1, "last_time": None}
+
+    def poll():
+        if controller.packets_received != state["last_count"]:
+            state["last_count"] = controller.packets_received
+            state["last_time"] = time.perf_counter()
+        elif not sender.is_alive():
+            app.quit()
+
+    timer = QtCore.QTimer()
+    timer.timeout.connect(poll)
+    timer.start(100)
+
+    start = time.perf_counter()
+    sender.start()
+    app.exec_()
+    sender.join()
+    timer.stop()
+    controller.close()
+
+    elapsed = (state["last_time"] or time.perf_counter()) - start
+    return controller.packets_received, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NetController receive benchmark")
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--strands", type=int, default=64)
+    parser.add_argument("--pixels", type=int, default=160)
+    parser.add_argument("--port", type=int, default=3021)
+    args = parser.parse_args()
+
+    app = QtCore.QCoreApplication(["bench_receive"])
+    packets = make_frame(args.strands, args.pixels)
+    sent = args.frames * len(packets)
+
+    for backend in BACKENDS:
+        received, elapsed = run_backend(app, backend, args.port,
+                                        args.frames, packets)
+        print("%-8s %8d / %d packets in %6.3fs: %10.0f packets/sec" %
+              (backend, received, sent, elapsed, received / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""
+Helpers shared by the benchmark and load-generator scripts in test/.
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from models.scene import Scene
+
+
+def load_scene(path):
+    """
+    Loads a scene file without touching it.  Loading a v1 scene migrates
+    and re-saves it, so a copy is loaded instead.  The copy is deleted
+    afterwards, so the returned scene has no file path and does not use the
+    on-disk geometry cache.
+    """
+    tmpdir = tempfile.mkdtemp(prefix="firesim-bench-")
+    try:
+        copy = os.path.join(tmpdir, os.path.basename(path))
+        shutil.copy(path, copy)
+        scene = Scene(copy)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    scene.filepath = None
+    scene.cache_geometry = False
+    return scene
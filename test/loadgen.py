@@ -0,0 +1,200 @@
+"""
+Synthetic FireMix load generator for soak-testing the FireSim receiver.
+
+Sends real 'B'/'S'/'E' frames (see lib/protocol.py) at a fixed rate.  The
+strand layout comes from a scene file or from --strands/--pixels.  Colors
+are generated with NumPy a second's worth of frames at a time.  It can also
+send bursts of unpaced frames and deliberately misbehave, by dropping 'E'
+packets or shuffling a frame's packets, to check how the receiver copes.
+
+    python test/loadgen.py --scene data/scenes/lotus.json --fps 120
+    python test/loadgen.py --strands 256 --pixels 300 --fps 60 \\
+        --burst 30 --burst-interval 5 --drop-end 0.01 --reorder 0.01
+"""
+from __future__ import print_function
+import argparse
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+from lib.protocol import BEGIN_FRAME, END_FRAME, strand_packet
+
+
+def scene_strand_lengths(path):
+    # Imported here so that synthetic layouts do not need Qt
+    from bench_util import load_scene
+    return load_scene(path).get_strand_lengths()
+
+
+def hsv_to_rgb(h, s, v):
+    """
+    Vectorized HSV -> RGB for arrays with values in [0, 1]; returns floats
+    with a trailing axis of 3.
+    """
+    i = np.floor(h * 6).astype(int) % 6
+    f = h * 6 - np.floor(h * 6)
+    p = v * (1 - s)
+    q = v * (1 - f * s)
+    t = v * (1 - (1 - f) * s)
+    choices = [np.stack(c, axis=-1) for c in
+               ((v, t, p), (q, v, p), (p, v, t), (p, q, v), (t, p, v), (v, p, q))]
+    return np.choose(i[..., np.newaxis], choices)
+
+
+def generate_block(pattern, num_frames, num_pixels, first_frame, fps, rng):
+    """
+    Returns a (num_frames, num_pixels, 3) uint8 block of colors
+    """
+    t = (first_frame + np.arange(num_frames))[:, np.newaxis] / float(fps)
+    position = np.arange(num_pixels)[np.newaxis, :] / float(max(num_pixels, 1))
+
+    if pattern == "noise":
+        return rng.randint(0, 256, (num_frames, num_pixels, 3)).astype(np.uint8)
+
+    if pattern == "chase":
+        phase = np.mod(position * 20 - t * 2, 1.0)
+        level = np.clip(1 - phase * 4, 0, 1)
+        hue = np.broadcast_to(np.mod(t * 0.1, 1.0), level.shape)
+        rgb = hsv_to_rgb(hue, np.ones_like(level), level)
+    else:
+        hue = np.mod(position + t * 0.25, 1.0)
+        ones = np.ones_like(hue)
+        rgb = hsv_to_rgb(hue, ones, ones)
+
+    return (rgb * 255).astype(np.uint8)
+
+
+class LoadGenerator(object):
+
+    def __init__(self, args, strand_lengths):
+        self.args = args
+        self.strands = sorted(strand_lengths)
+        self.bounds = []
+        start = 0
+        for strand in self.strands:
+            self.bounds.append((strand, start, start + strand_lengths[strand]))
+            start += strand_lengths[strand]
+        self.num_pixels = start
+
+        self.rng = np.random.RandomState(args.seed)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.address = (args.host, args.port)
+
+        self.block = None
+        self.block_start = 0
+
+        self.frames_sent = 0
+        self.packets_sent = 0
+        self.bytes_sent = 0
+        self.ends_dropped = 0
+        self.frames_reordered = 0
+
+    def colors_for_frame(self, frame):
+        block_size = max(int(self.args.fps), 1)
+        if self.block is None or frame >= self.block_start + block_size:
+            self.block_start = frame
+            self.block = generate_block(self.args.pattern, block_size,
+                                        self.num_pixels, frame, self.args.fps,
+                                        self.rng)
+        return self.block[frame - self.block_start]
+
+    def send_frame(self, frame):
+        colors = self.colors_for_frame(frame)
+        packets = [strand_packet(strand, colors[start:end])
+                   for strand, start, end in self.bounds]
+
+        end = [END_FRAME]
+        if self.rng.random_sample() < self.args.drop_end:
+            end = []
+            self.ends_dropped += 1
+
+        packets = [BEGIN_FRAME] + packets + end
+        if self.rng.random_sample() < self.args.reorder:
+            self.rng.shuffle(packets)
+            self.frames_reordered += 1
+
+        for packet in packets:
+            self.sock.sendto(packet, self.address)
+            self.bytes_sent += len(packet)
+        self.packets_sent += len(packets)
+        self.frames_sent += 1
+
+    def run(self):
+        args = self.args
+        interval = 1.0 / args.fps
+        start = time.perf_counter()
+        next_frame_time = start
+        next_burst_time = start + args.burst_interval
+        frame = 0
+
+        try:
+            while args.duration <= 0 or time.perf_counter() - start < args.duration:
+                now = time.perf_counter()
+                if args.burst > 0 and now >= next_burst_time:
+                    for _ in range(args.burst):
+                        self.send_frame(frame)
+                        frame += 1
+                    next_burst_time = now + args.burst_interval
+
+                self.send_frame(frame)
+                frame += 1
+
+                next_frame_time += interval
+                delay = next_frame_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                elif delay < -1:
+                    # Can't keep up; don't try to catch up with a huge burst
+                    next_frame_time = time.perf_counter()
+        except KeyboardInterrupt:
+            pass
+
+        elapsed = time.perf_counter() - start
+        print("Sent %d frames (%d packets, %0.1f MB) in %0.1fs: %0.1f fps, %0.0f pps" %
+              (self.frames_sent, self.packets_sent, self.bytes_sent / 1e6,
+               elapsed, self.frames_sent / elapsed, self.packets_sent / elapsed))
+        print("Dropped %d 'E' packets, reordered %d frames" %
+              (self.ends_dropped, self.frames_reordered))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FireMix load generator")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3020)
+    parser.add_argument("--scene", type=str,
+                        help="Scene file to take the strand layout from")
+    parser.add_argument("--strands", type=int, default=16,
+                        help="Number of strands (without --scene)")
+    parser.add_argument("--pixels", type=int, default=300,
+                        help="Pixels per strand (without --scene)")
+    parser.add_argument("--fps", type=float, default=60.0)
+    parser.add_argument("--duration", type=float, default=0,
+                        help="Seconds to run for (0 = until Ctrl-C)")
+    parser.add_argument("--pattern", choices=["rainbow", "chase", "noise"],
+                        default="rainbow")
+    parser.add_argument("--burst", type=int, default=0,
+                        help="Extra frames to send back-to-back every --burst-interval seconds")
+    parser.add_argument("--burst-interval", type=float, default=5.0)
+    parser.add_argument("--drop-end", type=float, default=0.0,
+                        help="Probability of leaving out a frame's 'E' packet")
+    parser.add_argument("--reorder", type=float, default=0.0,
+                        help="Probability of shuffling a frame's packets")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.scene is not None:
+        strand_lengths = scene_strand_lengths(args.scene)
+    else:
+        strand_lengths = dict((strand, args.pixels)
+                              for strand in range(args.strands))
+
+    LoadGenerator(args, strand_lengths).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -8,11 +8,14 @@ from PyQt5.QtCore import (QObject, Qt, QPoint, QPointF, QRect, QRectF, QSizeF,
 from PyQt5.QtGui import (QPainter, QColor, QFont, QPen, QFontMetrics,
                          QOpenGLVersionProfile, QSurfaceFormat,
                          QOpenGLShader, QOpenGLShaderProgram, QVector2D,
-                         QVector4D, QMatrix4x4, QOpenGLBuffer, QImage)
+                         QVector4D, QMatrix4x4, QOpenGLBuffer, QImage,
+                         QImageReader)
 from PyQt5.QtQuick import QQuickPaintedItem
 from PyQt5.QtQml import QQmlListProperty
 
 from controllers.canvascontroller import CanvasController
+from lib.instrumentation import metrics
+from lib.profiler import profile_stage
 from models.pixelgroup import *
 
 
@@ -27,7 +30,20 @@ class CanvasView(QQuickPaintedItem):
 
     ENABLE_OPENGL = True
 
-    update_target_fps = pyqtSignal(float)
+    # Emitted when something on screen changed and the canvas should be
+    # repainted (see FrameScheduler)
+    repaint_requested = pyqtSignal()
+    # Emitted by repaint() when it schedules no paint, so no frame swap follows
+    nothing_to_present = pyqtSignal()
+
+    # Area covered by the stats overlay
+    STATS_RECT = QRectF(0, 0, 320, 72)
+    # Canvas-space margin around a pixel group's line that covers its
+    # highlight, handles, labels and pixel points
+    PIXEL_GROUP_MARGIN = 60
+    # Backdrops are decoded at no more than this many pixels on a side, so a
+    # huge site photo cannot take hundreds of megabytes
+    MAX_BACKDROP_SIZE = 4096
 
     def __init__(self, parent):
         super(CanvasView, self).__init__()
@@ -45,15 +61,47 @@ class CanvasView(QQuickPaintedItem):
 
         self.gl = None
 
+        # Pixel rendering state (see _update_pixel_buffers)
+        self._pixel_count = 0
+        self._pixel_colors = np.zeros((0, 4), dtype=np.uint8)
+        self._pixel_geometry_key = None
+
         self._frame_time = time.perf_counter()
         self._frame_count = 0
         self._fps = 0
-        self._fps_below_target = 0
-
+        self._latency_text = ""
+        self._stats_lines = []
+
+        # Dirty-region tracking for partial repaints (see repaint())
+        self._dirty_rect = QRectF()
+        self._painted_rects = {}
+
+        # Design-mode chrome: pens and fonts are made once, and the plain
+        # lines of unselected groups are cached in an image (see
+        # _update_chrome_layer)
+        self._highlight_pen = QPen(QColor(100, 100, 255, 170), 6,
+                                   Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
+        self._group_pen = QPen(QColor(100, 100, 100, 200), 2,
+                               Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
+        self._label_font = QFont()
+        self._label_font.setPointSize(8)
+        self._label_metrics = QFontMetrics(self._label_font)
+        self._label_sizes = {}
+        self._chrome_layer = None
+        self._chrome_layer_key = None
+        self._chrome_layer_version = None
+        self._chrome_layer_geometry = {}
+
+        # Decoded backdrop (bounded by MAX_BACKDROP_SIZE), and a copy scaled
+        # to the canvas that is drawn without any per-paint scaling
         self._cached_backdrop = None
         self._cached_backdrop_path = None
+        self._scaled_backdrop = None
+        self._scaled_backdrop_key = None
 
         self.windowChanged.connect(self.on_window_changed)
+        self.model.changed.connect(self.repaint_requested)
+        self.selection_changed.connect(self.repaint_requested)
 
     selection_changed = pyqtSignal()
     model_changed = pyqtSignal()
@@ -78,10 +126,19 @@ class CanvasView(QQuickPaintedItem):
     def selection(self):
         return QQmlListProperty(PixelGroup, self, self.controller.selected)
 
+    @property
+    def fps(self):
+        """
+        Paints per second, measured over the last second or so
+        """
+        return self._fps
+
     def geometryChanged(self, old_rect, new_rect):
-        pass
+        self.model.mark_dirty()
+        self.repaint_requested.emit()
 
     def on_window_changed(self, window):
+        self.model.mark_dirty()
         if self.ENABLE_OPENGL:
             self.init_opengl()
 
@@ -106,11 +163,12 @@ class CanvasView(QQuickPaintedItem):
 #version 120
 attribute highp vec4 posAttr;
 attribute lowp vec4 colAttr;
+uniform highp mat4 matrix;
 varying lowp vec4 col;
 
 void main() {
     col = colAttr;
-    gl_Position = posAttr;
+    gl_Position = matrix * posAttr;
 }
  '''
 
@@ -128,7 +186,10 @@ vec4 blur5(sampler2D image, vec2 uv, vec2 resolution, vec2 direction) {
 
 void main (void)
 {
-    gl_FragColor = vec4(0, 0, 0, 0);
+    // Pixels on strands that have not received any data yet are not drawn
+    if (col.a == 0.0)
+        discard;
+    gl_FragColor = col;
 }
 '''
 
@@ -143,21 +204,81 @@ void main (void)
         self.program.link()
 
         self.pos_attr = self.program.attributeLocation('posAttr')
+        self.col_attr = self.program.attributeLocation('colAttr')
+
+        # Pixel positions only change when the scene geometry or window size
+        # does; colors are rewritten every frame.
+        self.vertex_buf = QOpenGLBuffer()
+        self.vertex_buf.create()
+        self.vertex_buf.setUsagePattern(QOpenGLBuffer.StaticDraw)
 
-        self.vertices = np.array([
-                 0.0,  0.707,
-                -0.5, -0.5,
-                 0.5, -0.5
-            ], dtype=np.float32)
+        self.color_buf = QOpenGLBuffer()
+        self.color_buf.create()
+        self.color_buf.setUsagePattern(QOpenGLBuffer.StreamDraw)
 
-        self.buf = QOpenGLBuffer()
-        self.buf.create()
-        self.buf.bind()
-        self.buf.setUsagePattern(QOpenGLBuffer.StaticDraw)
-        self.buf.allocate(self.vertices, self.vertices.nbytes)
+        self._pixel_geometry_key = None
 
-        self.buf.release()
+    def _update_pixel_buffers(self):
+        """
+        Rebuilds the vertex buffer from the scene's packed pixel locations if
+        they have been invalidated or the window has changed size, and
+        reallocates the color buffer to match.
+        """
+        scene = self.model.scene
+        key = (scene.pixel_locations_version, self.width(), self.height(),
+               self.window().width(), self.window().height())
+        if key == self._pixel_geometry_key:
+            return
+        self._pixel_geometry_key = key
+
+        locations = scene.get_packed_pixel_locations()
+        self._pixel_count = len(locations)
+        self._pixel_colors = np.zeros((self._pixel_count, 4), dtype=np.uint8)
+        if self._pixel_count == 0:
+            return
+
+        # Same transform as scene_to_canvas, plus the Y flip for GL
+        scale, _ = self.scene_to_canvas((1, 1))
+        vertices = locations * np.float32(scale)
+        vertices[:, 1] = self.height() - vertices[:, 1]
+
+        self.vertex_buf.bind()
+        self.vertex_buf.allocate(vertices, vertices.nbytes)
+        self.vertex_buf.release()
+
+        self.color_buf.bind()
+        self.color_buf.allocate(self._pixel_colors.nbytes)
+        self.color_buf.release()
+
+    def _draw_pixels(self, matrix):
+        self._update_pixel_buffers()
+        if self._pixel_count == 0:
+            return
+        self._pixel_colors = self.model.scene.gather_pixel_colors(
+            self.model.color_data, self._pixel_colors)
 
+        gl = self.gl
+        self.program.bind()
+        self.program.setUniformValue('matrix', matrix)
+
+        self.vertex_buf.bind()
+        self.program.enableAttributeArray(self.pos_attr)
+        self.program.setAttributeBuffer(self.pos_attr, gl.GL_FLOAT, 0, 2)
+
+        self.color_buf.bind()
+        self.color_buf.write(0, self._pixel_colors, self._pixel_colors.nbytes)
+        self.program.enableAttributeArray(self.col_attr)
+        # Normalized, so 0-255 maps to 0.0-1.0 in the shader
+        self.program.setAttributeBuffer(self.col_attr, gl.GL_UNSIGNED_BYTE,
+                                        0, 4)
+
+        gl.glDrawArrays(gl.GL_POINTS, 0, self._pixel_count)
+
+        self.program.disableAttributeArray(self.col_attr)
+        self.program.disableAttributeArray(self.pos_attr)
+        self.color_buf.release()
+        self.vertex_buf.release()
+        self.program.release()
 
     def scene_to_canvas(self, coord):
         """
@@ -183,27 +304,76 @@ void main (void)
         scaled = (coord[0] * scale, coord[1] * scale)
         return scaled
 
+    @pyqtSlot()
+    def repaint(self):
+        """
+        Schedules a paint of whatever changed since the last one: the whole
+        canvas if the model is dirty (this includes every new frame), else
+        the old and new areas of the pixel groups that changed, plus the stats
+        overlay if its text changed.  If nothing changed, nothing is painted
+        and nothing_to_present is emitted.
+        """
+        self.controller.swap_frame()
+        self._update_stats()
+
+        if self.model.dirty:
+            self.update()
+            return
+
+        region = QRectF(self._dirty_rect)
+        if self._current_stats_lines() != self._stats_lines:
+            region |= self.STATS_RECT
+        if not region.isEmpty():
+            self.update(region.toAlignedRect())
+        else:
+            self.nothing_to_present.emit()
+
+    @pyqtSlot(QObject)
+    def invalidate_pixel_group(self, pg):
+        """
+        Adds the area pg was last painted in, and the area it covers now, to
+        the region to repaint.
+        """
+        rect = self._pixel_group_rect(pg)
+        old_rect = self._painted_rects.get(pg)
+        if old_rect is not None:
+            rect |= old_rect
+        self._dirty_rect |= rect
+        self.repaint_requested.emit()
+
+    def _pixel_group_rect(self, pg):
+        x1, y1 = self.scene_to_canvas(pg.start)
+        x2, y2 = self.scene_to_canvas(pg.end)
+        margin = max(self.PIXEL_GROUP_MARGIN,
+                     3 * self.scene_to_canvas((10, 10))[0])
+        return QRectF(min(x1, x2) - margin, min(y1, y2) - margin,
+                      abs(x2 - x1) + 2 * margin, abs(y2 - y1) + 2 * margin)
+
+    @profile_stage("paint")
     def paint(self, painter):
 
-        start = time.time()
+        start = time.perf_counter()
+
+        self.controller.swap_frame()
+
+        # A partial update (see repaint()) arrives with the painter clipped
+        # to the dirty region, which Qt has already cleared.
+        clip = painter.clipBoundingRect() if painter.hasClipping() else None
+        if clip is not None and clip.contains(QRectF(0, 0, self.width(),
+                                                     self.height())):
+            clip = None
 
         painter.setRenderHint(QPainter.SmoothPixmapTransform)
 
         if self.model.scene.backdrop_enable:
-            if self._cached_backdrop is None or self._cached_backdrop_path != self.model.scene.backdrop_filepath:
-                log.info("Loading backdrop from %s" % self.model.scene.backdrop_filepath)
-                self._cached_backdrop = QImage(self.model.scene.backdrop_filepath)
-                if self._cached_backdrop is None:
-                    log.warn("Could not load backdrop image; disabling")
-                    self.model.scene.backdrop_enable = False
-                else:
-                    self._cached_backdrop_path = self.model.scene.backdrop_filepath
-
-            iw, ih = self.scene_to_canvas(self.model.scene.extents)
-            painter.drawImage(QRect(0, 0, iw, ih),
-                              self._cached_backdrop)
+            backdrop = self._get_scaled_backdrop()
+            if backdrop is not None:
+                painter.drawImage(QPointF(0, 0), backdrop)
         else:
             self._cached_backdrop = None
+            self._cached_backdrop_path = None
+            self._scaled_backdrop = None
+            self._scaled_backdrop_key = None
 
 
         if self.ENABLE_OPENGL:
@@ -216,16 +386,22 @@ void main (void)
                 h = self.height() * ratio
 
                 gl.glViewport(0, 0, w, h)
-                gl.glMatrixMode(gl.GL_PROJECTION)
-                gl.glLoadIdentity()
-
-                gl.glOrtho(0, w, h, 0, -10, 10)
 
-                gl.glMatrixMode(gl.GL_MODELVIEW)
-                gl.glLoadIdentity()
+                matrix = QMatrix4x4()
+                matrix.ortho(0, w, h, 0, -10, 10)
 
                 gl.glEnable(gl.GL_SCISSOR_TEST)
-                gl.glScissor(0, 0, w, h)
+                if clip is None:
+                    gl.glScissor(0, 0, w, h)
+                else:
+                    # The FBO is painted flipped and the vertices are
+                    # already Y-flipped (see _update_pixel_buffers), so
+                    # framebuffer row 0 is the top of the item.
+                    r = clip.toAlignedRect()
+                    gl.glScissor(int(r.x() * ratio),
+                                 int(r.y() * ratio),
+                                 int(r.width() * ratio),
+                                 int(r.height() * ratio))
 
                 if not self.model.backdrop_enable:
                     gl.glClearColor(0, 0, 0, 1)
@@ -234,33 +410,7 @@ void main (void)
                 size = self.scene_to_canvas((10, 10))[0]
                 gl.glPointSize(3 * size if self.model.blurred else size)
 
-                gl.glBegin(gl.GL_POINTS)
-
-                for pg in self.model.scene.pixel_groups:
-                    if type(pg) == LinearPixelGroup:
-                        colors = self.model.color_data.get(pg.strand, None)
-                        if colors is None:
-                            continue
-
-                        colors = colors[pg.offset:pg.offset + pg.count]
-
-                        x1, y1 = self.scene_to_canvas(pg.start)
-                        x2, y2 = self.scene_to_canvas(pg.end)
-
-                        y1 = self.height() - y1
-                        y2 = self.height() - y2
-                        dx = (x2 - x1) / pg.count
-                        dy = (y2 - y1) / pg.count
-
-                        x, y = x1, y1
-                        for r, g, b in colors:
-                            gl.glColor4f(r / 255, g / 255, b / 255, 1)
-                            gl.glVertex2f(x, y)
-
-                            x += dx
-                            y += dy
-
-                gl.glEnd()
+                self._draw_pixels(matrix)
 
                 gl.glDisable(gl.GL_SCISSOR_TEST)
 
@@ -276,11 +426,30 @@ void main (void)
         s = set(selected)
         unselected = [pg for pg in self.model.scene.pixel_groups if pg not in s]
 
-        for pg in unselected:
-            self.painters[pg.__class__](self, painter, pg)
-
-        for pg in selected:
-            self.painters[pg.__class__](self, painter, pg)
+        if clip is None:
+            self._painted_rects.clear()
+        if self.model.design_mode:
+            # Unselected groups come from the cached layer (which draws only
+            # their plain line); selected and hovered groups are drawn live.
+            self._update_chrome_layer(unselected + selected)
+            painter.drawImage(QRectF(0, 0, self.width(), self.height()),
+                              self._chrome_layer)
+
+            for pg in unselected + selected:
+                rect = self._pixel_group_rect(pg)
+                if clip is not None and not rect.intersects(clip):
+                    continue
+                if pg in s:
+                    self.painters[pg.__class__](self, painter, pg)
+                self._painted_rects[pg] = rect
+                if clip is None or clip.contains(rect):
+                    pg.dirty = False
+
+        # Anything invalidated after repaint() ran stays dirty for next time
+        if clip is None or clip.contains(self._dirty_rect):
+            self._dirty_rect = QRectF()
+        if clip is None:
+            self.model.dirty = False
 
         self._render_pixels_this_frame = False
 
@@ -296,30 +465,153 @@ void main (void)
         #     painter.drawLine(QPointF(x, y - 5),QPointF(x, y + 5))
 
         self._frame_count += 1
+        self._update_stats()
+
+        # Stats
+        if clip is None or clip.intersects(self.STATS_RECT):
+            painter.setFont(self._label_font)
+            painter.setPen(QColor(160, 150, 150, 200))
+            self._stats_lines = self._current_stats_lines()
+            for i, line in enumerate(self._stats_lines):
+                painter.drawText(8, 16 * (i + 1), line)
+
+        self.controller.frame_painted(start)
+
+    def _update_stats(self):
         delta = time.perf_counter() - self._frame_time
-        if delta > 1 and self._frame_count > 1:
-            self._fps = 0 if delta == 0 else (self._frame_count / delta)
+        if delta > 1:
+            self._fps = self._frame_count / delta
             self._frame_count = 0
             self._frame_time = time.perf_counter()
+            self._latency_text = self._format_latency()
+
+    def _current_stats_lines(self):
+        net = self.gui.netcontroller
+        lines = ["Net %d pps / %d fps" % (net.pps, net.fps),
+                 "GUI %d fps" % self._fps]
+        if self.controller.frame_buffer is not None:
+            lines.append("Net %d dropped / %d overwritten" %
+                         (net.dropped_frames,
+                          self.controller.frame_buffer.overwritten))
+        if self._latency_text:
+            lines.append(self._latency_text)
+        return lines
+
+    def _format_latency(self):
+        """
+        Returns the end-to-end latency line of the stats overlay, refreshed
+        once a second rather than on every paint.
+        """
+        latency = metrics.histograms["glass_to_glass"].summary()
+        if latency["p50_ms"] is None:
+            return ""
+        return "Latency p50 %0.1f / p95 %0.1f / p99 %0.1f ms" % (
+            latency["p50_ms"], latency["p95_ms"], latency["p99_ms"])
 
-            # Auto throttle
-            if self._fps < self.gui.target_fps - 10:
-                self._fps_below_target += 1
-                if self._fps_below_target > 10:
-                    new_target = max(self.gui.target_fps - 10, 10)
-                    log.warn("FPS target not met; lowering to %d" % new_target)
-                    self.update_target_fps.emit(new_target)
-                    self._fps_below_target = 0
-
-        # Stats
-        f = QFont()
-        f.setPointSize(8)
-        painter.setFont(f)
-        painter.setPen(QColor(160, 150, 150, 200))
-        painter.drawText(8, 16, "Net %d pps / %d fps" %
-                         (self.gui.netcontroller.pps,
-                          self.gui.netcontroller.fps))
-        painter.drawText(8, 32, "GUI %d fps" % self._fps)
+    def _get_scaled_backdrop(self):
+        """
+        Returns the backdrop scaled to the scene's extents on the canvas, at
+        device resolution, or None if it could not be loaded.  The file is
+        decoded once per path and rescaled only when the canvas size changes.
+        """
+        path = self.model.scene.backdrop_filepath
+        if self._cached_backdrop is None or self._cached_backdrop_path != path:
+            log.info("Loading backdrop from %s" % path)
+            self._scaled_backdrop = None
+            self._cached_backdrop = self._load_backdrop(path)
+            if self._cached_backdrop is None:
+                log.warn("Could not load backdrop image; disabling")
+                self.model.scene.backdrop_enable = False
+                return None
+            self._cached_backdrop_path = path
+
+        ratio = self.window().devicePixelRatio()
+        iw, ih = self.scene_to_canvas(self.model.scene.extents)
+        key = (path, int(iw * ratio), int(ih * ratio), ratio)
+        if key != self._scaled_backdrop_key:
+            self._scaled_backdrop_key = key
+            scaled = self._cached_backdrop.scaled(
+                max(key[1], 1), max(key[2], 1), Qt.IgnoreAspectRatio,
+                Qt.SmoothTransformation)
+            # The format QPainter blends fastest
+            scaled = scaled.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+            scaled.setDevicePixelRatio(ratio)
+            self._scaled_backdrop = scaled
+        return self._scaled_backdrop
+
+    def _load_backdrop(self, path):
+        """
+        Decodes the image at path, downscaled while decoding if it is larger
+        than MAX_BACKDROP_SIZE.  Returns None on failure.
+        """
+        reader = QImageReader(path)
+        reader.setAutoTransform(True)
+        size = reader.size()
+        if size.isValid():
+            longest = max(size.width(), size.height())
+            if longest > self.MAX_BACKDROP_SIZE:
+                size *= self.MAX_BACKDROP_SIZE / longest
+                reader.setScaledSize(size)
+        image = reader.read()
+        if image.isNull():
+            log.error("Could not read backdrop %s: %s" %
+                      (path, reader.errorString()))
+            return None
+        return image
+
+    def _update_chrome_layer(self, pixel_groups):
+        """
+        Rebuilds the cached image of the plain lines of every unselected
+        pixel group if the zoom, the item size or the selection changed, or if
+        one of the cached groups has moved since it was drawn.
+        """
+        ratio = self.window().devicePixelRatio()
+        width, height = int(self.width()), int(self.height())
+        key = (self.scene_to_canvas((1, 1)), width, height, ratio,
+               frozenset(id(pg) for pg in pixel_groups if pg.selected),
+               id(self.model.scene.pixel_groups), len(pixel_groups))
+
+        version = self.model.scene.pixel_locations_version
+        if key == self._chrome_layer_key:
+            if version == self._chrome_layer_version:
+                return
+            # Some group's geometry changed; only a cached one matters
+            self._chrome_layer_version = version
+            cached = self._chrome_layer_geometry
+            if all(cached.get(pg) == (pg.start, pg.end)
+                   for pg in pixel_groups if pg.dirty and pg in cached):
+                return
+
+        self._chrome_layer_key = key
+        self._chrome_layer_version = version
+        self._chrome_layer_geometry = {}
+
+        layer = QImage(max(int(width * ratio), 1), max(int(height * ratio), 1),
+                       QImage.Format_ARGB32_Premultiplied)
+        layer.setDevicePixelRatio(ratio)
+        layer.fill(Qt.transparent)
+
+        painter = QPainter(layer)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(self._group_pen)
+        for pg in pixel_groups:
+            if pg.selected:
+                continue
+            x1, y1 = self.scene_to_canvas(pg.start)
+            x2, y2 = self.scene_to_canvas(pg.end)
+            painter.drawLine(QPointF(x1, y1), QPointF(x2, y2))
+            self._chrome_layer_geometry[pg] = (pg.start, pg.end)
+        painter.end()
+
+        self._chrome_layer = layer
+
+    def _label_size(self, text):
+        size = self._label_sizes.get(text)
+        if size is None:
+            rect = self._label_metrics.boundingRect(text)
+            rect += QMargins(5, 2, 5, 2)
+            size = self._label_sizes[text] = rect.size()
+        return size
 
     def _paint_linear_pixel_group(self, painter, pg):
         x1, y1 = self.scene_to_canvas(pg.start)
@@ -335,18 +627,10 @@ void main (void)
             #     self._draw_bounding_box(painter, pg, c)
 
             if pg.selected or pg.hovering:
-                painter.setPen(QPen(QColor(100, 100, 255, 170),
-                                          6,
-                                          Qt.SolidLine,
-                                          Qt.RoundCap,
-                                          Qt.RoundJoin))
+                painter.setPen(self._highlight_pen)
                 painter.drawLine(QPointF(x1, y1),QPointF(x2, y2))
 
-            painter.setPen(QPen(QColor(100, 100, 100, 200),
-                                      2,
-                                      Qt.SolidLine,
-                                      Qt.RoundCap,
-                                      Qt.RoundJoin))
+            painter.setPen(self._group_pen)
             painter.drawLine(QPointF(x1, y1),QPointF(x2, y2))
 
             if pg.selected:
@@ -386,15 +670,11 @@ void main (void)
         painter.drawRoundedRect(rect, 2, 2)
 
         label_pos = QPoint(x + 15, y + 15)
-        label_font = QFont()
-        label_font.setPointSize(8)
-        painter.setFont(label_font)
+        painter.setFont(self._label_font)
 
         label_string = "Start" if (handle == handle.parent.start_handle) else "End"
-        fm = QFontMetrics(label_font)
-        text_rect = fm.boundingRect(label_string)
-        text_rect += QMargins(5, 2, 5, 2)
-        label_rect = QRect(label_pos - QPoint(12, 7), text_rect.size())
+        label_rect = QRect(label_pos - QPoint(12, 7),
+                           self._label_size(label_string))
         painter.setBrush(QColor(128, 64, 128, 150))
         painter.setPen(QColor(100, 100, 100, 50))
         painter.drawRoundedRect(label_rect, 5, 5)
@@ -406,15 +686,11 @@ void main (void)
         x2, y2 = self.scene_to_canvas(pg.end)
         label_pos = QPoint((x1 + x2) / 2 + offset[0], (y1 + y2) / 2 + offset[1])
 
-        label_font = QFont()
-        label_font.setPointSize(8)
-        painter.setFont(label_font)
+        painter.setFont(self._label_font)
 
         label_string = "%d:%d" % (pg.strand, pg.offset)
-        fm = QFontMetrics(label_font)
-        text_rect = fm.boundingRect(label_string)
-        text_rect += QMargins(5, 2, 5, 2)
-        label_rect = QRect(label_pos - QPoint(12, 7), text_rect.size())
+        label_rect = QRect(label_pos - QPoint(12, 7),
+                           self._label_size(label_string))
 
         painter.setBrush(QColor(128, 64, 128, 220))
         painter.setPen(QColor(100, 100, 100, 100))
@@ -424,23 +700,29 @@ void main (void)
 
     def hoverMoveEvent(self, event):
         self.controller.on_hover_move(event)
+        self.repaint_requested.emit()
 
     def mouseMoveEvent(self, event):
         self.controller.on_mouse_move(event)
+        self.repaint_requested.emit()
 
     def mousePressEvent(self, event):
         self.controller.on_mouse_press(event)
+        self.repaint_requested.emit()
 
     def mouseReleaseEvent(self, event):
         self.controller.on_mouse_release(event)
+        self.repaint_requested.emit()
 
     def keyPressEvent(self, event):
         event.accept()
         self.controller.on_key_press(event)
+        self.repaint_requested.emit()
 
     def keyReleaseEvent(self, event):
         event.accept()
         self.controller.on_key_release(event)
+        self.repaint_requested.emit()
 
 
 class CanvasRenderer(QObject):